@@ -1,51 +1,87 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
-def load_program() -> List[int]:
-    with open("input") as f:
-        return [int(n) for n in f.read().split(",")]
+from intcode import Program, load_program, symbolic
+from intcode.search import search
+try:
+    from intcode.batch import Batch
+except ImportError:  # no numpy
+    Batch = None
 
 
-def step(mem: List[int], pos: int) -> Optional[int]:
-    opcode = mem[pos]
-    if opcode == 1:
-        # Add
-        mem[mem[pos+3]] = mem[mem[pos+1]] + mem[mem[pos+2]]
-        return pos+4
-    elif opcode == 2:
-        # Mult
-        mem[mem[pos+3]] = mem[mem[pos+1]] * mem[mem[pos+2]]
-        return pos+4
-    elif opcode == 99:
-        # Exit
-        return None
-    assert False
+def run_day2(base: Program, noun: int, verb: int) -> int:
+    p = base.fork()
+    p.store(1, noun)
+    p.store(2, verb)
+    p.run()
+    return p.load(0)
 
 
-def process(mem: List[int]):
-    pos = 0
-    while pos is not None:
-        pos = step(mem, pos)
+def run_pair(base: Program, pair: Tuple[int, int]) -> int:
+    return run_day2(base, *pair)
 
 
-def run_day2(mem: List[int], noun: int, verb: int) -> int:
-    mem[1] = noun
-    mem[2] = verb
-    process(mem)
-    return(mem[0])
+def find_inputs(image: List[int], pairs: List[Tuple[int, int]], target: int) -> Optional[Tuple[int, int]]:
+    """The (noun, verb) in pairs that makes image produce target"""
+    if Batch is None:
+        found = search(image, pairs, run_pair, lambda _, v: v == target)
+        return found and found[0]
+
+    b = Batch(image, len(pairs))
+    b.set(1, [noun for noun, _ in pairs])
+    b.set(2, [verb for _, verb in pairs])
+    b.run()
+    for pair, v in zip(pairs, b.get(0).tolist()):
+        if v == target:
+            return pair
+    return None
+
+
+def test_find_inputs():
+    image = load_program()
+    pairs = [(12, 2), (0, 0), (99, 99), (57, 41)]
+    target = run_day2(Program(image), 99, 99)
+    assert find_inputs(image, pairs, target) == (99, 99)
+    assert search(image, pairs, run_pair, lambda _, v: v == target, processes=1) == ((99, 99), target)
+    # a pool still gives the first match in candidate order
+    assert search(image, pairs, run_pair, lambda _, v: True, processes=2, chunksize=1, serial=0)[0] == (12, 2)
+    assert find_inputs(image, pairs, -1) is None
+
+def test_symbolic():
+    image = load_program()
+    f = symbolic.evaluate(image)
+    for noun, verb in [(12, 2), (0, 0), (99, 99), (57, 41)]:
+        assert f(noun, verb) == run_day2(Program(image), noun, verb)
+    assert symbolic.solve(image, f(57, 41), range(100), range(100)) == (57, 41)
+    assert symbolic.solve(image, -1, range(100), range(100)) is None
+
+    # mem[0] = noun * verb + noun
+    image = [1,0,0,3, 2,1,2,0, 1,0,1,0, 99]
+    assert symbolic.solve(image, 96, range(100), range(100)) == (1, 95)
+
+def run_tests():
+    test_find_inputs()
+    test_symbolic()
 
 
 def solve1():
-    mem = load_program()
-    print(run_day2(mem, 12, 2))
+    base = Program(load_program())
+    print(run_day2(base, 12, 2))
 
 
 def solve2():
-    mem = load_program()
-    for i in range(100):
-        for j in range(100):
-            if run_day2(mem[:], i, j) == 19690720:
-                print(100*i + j)
-                return
-
-solve1()
-solve2()
+    image = load_program()
+    try:
+        noun, verb = symbolic.solve(image, 19690720, range(100), range(100))
+    except symbolic.NotSymbolic:
+        pairs = [(i, j) for i in range(100) for j in range(100)]
+        noun, verb = find_inputs(image, pairs, 19690720)
+    print(100*noun + verb)
+
+# pool workers may import this module, they must not run it
+if __name__ == "__main__":
+    run_tests()
+    solve1()
+    solve2()
@@ -1,4 +1,9 @@
 # coding: utf8
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from intcode.render import BW, show
 
 def layers(data, h, w):
     ls = []
@@ -25,9 +30,6 @@ def solve1():
     print(count(min_0, 1) * count(min_0, 2))
 
 def solve2():
-    def d_to_c(d):
-        return "█" if d == 0 else " "
-
     ls = read_layers()
 
     img = [2] * (25*6)
@@ -37,8 +39,7 @@ def solve2():
             if d == 2:
                 img[i] = l[i]
 
-    for i in range(6):
-        print("".join(d_to_c(d) for d in img[i*25:i*25+25]))
+    show({(i % 25, i // 25): d for i, d in enumerate(img)}, BW)
 
 
 solve1()
@@ -1,168 +1,15 @@
-from typing import List, Optional
-import sys
 import itertools
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
-DEBUG = False
-
-
-def debug(s):
-    if DEBUG:
-        print(s, file=sys.stderr)
-
-
-def load_program() -> List[int]:
-    with open("input") as f:
-        return [int(n) for n in f.read().split(",")]
-
-
-class Program:
-    def __init__(self, mem, inp):
-        self.mem = mem
-        self.inp = inp
-        self.out = []
-        self.pos = 0
-        self.rb = 0
-
-    def run(self) -> None:
-        while self.pos is not None:
-            self.step()
-
-    def run_out(self) -> Optional[int]:
-        while self.pos is not None:
-            if self.out:
-                return self.out.pop(0)
-            self.step()
-        return None
-
-    def read(self, arg, mode) -> int:
-        if mode == 0:
-            if arg >= len(self.mem):
-                return 0  # uninitialized memory
-            return self.mem[arg]
-        elif mode == 1:
-            return arg
-        elif mode == 2:
-            addr = self.rb + arg
-            if addr >= len(self.mem):
-                return 0  # uninitialized memory
-            return self.mem[addr]
-
-        else:
-            assert False
-
-    def write(self, dest, mode, value) -> None:
-        assert mode == 0 or mode == 2
-        if mode == 2:
-            dest += self.rb
-
-        if dest >= len(self.mem):
-            self.mem.extend((0 for _ in range(dest - len(self.mem) + 100)))
-        self.mem[dest] = value
-
-    def step(self):
-        assert self.pos < len(self.mem), "program counter out of range: {}".format(self.pos)
-        assert self.pos >= 0, "program counter out of range: {}".format(self.pos)
-
-        opcode = self.mem[self.pos] % 100
-        def modes(n):
-            return ((self.mem[self.pos] // (100 * (10**i))) % 10 for i in range(n))
-
-        if opcode == 1:
-            # Add
-            arg1, arg2, arg3 = self.mem[self.pos+1:self.pos+4]
-            mode1, mode2, mode3 = modes(3)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            debug("[{} + {} => {}]".format(v1, v2, arg3))
-            self.write(arg3, mode3, v1 + v2)
-            self.pos += 4
-        elif opcode == 2:
-            # Mult
-            arg1, arg2, arg3 = self.mem[self.pos+1:self.pos+4]
-            mode1, mode2, mode3 = modes(3)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            debug("[{} * {} => {}]".format(v1, v2, arg3))
-            self.write(arg3, mode3, v1 * v2)
-            self.pos += 4
-        elif opcode == 3:
-            # Read
-            arg1 = self.mem[self.pos+1]
-            mode1, = modes(1)
-            assert mode1 == 0 or mode1 == 2
-
-            debug("[read => {}]".format(arg1))
-            self.write(arg1, mode1, self.inp.pop(0))
-            self.pos += 2
-        elif opcode == 4:
-            # Write
-            arg1 = self.mem[self.pos+1]
-            mode1, = modes(1)
-            v1 = self.read(arg1, mode1)
-            debug("[write {}]".format(v1))
-            self.out.append(v1)
-            self.pos += 2
-        elif opcode == 5:
-            # jump-if-true
-            arg1, arg2 = self.mem[self.pos+1:self.pos+3]
-            mode1, mode2 = modes(2)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            debug("[if {} goto {}]".format(v1, v2))
-            if v1 != 0:
-                self.pos = v2
-            else:
-                self.pos += 3
-        elif opcode == 6:
-            # jump-if-false
-            arg1, arg2 = self.mem[self.pos+1:self.pos+3]
-            mode1, mode2 = modes(2)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            debug("[if-not {} goto {}]".format(v1, v2))
-            if v1 == 0:
-                self.pos = v2
-            else:
-                self.pos += 3
-        elif opcode == 7:
-            # less than
-            arg1, arg2, arg3 = self.mem[self.pos+1:self.pos+4]
-            mode1, mode2, mode3 = modes(3)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            debug("[{} < {} => {}]".format(v1, v2, arg3))
-            val = 1 if v1 < v2 else 0
-            self.write(arg3, mode3, val)
-            self.pos += 4
-        elif opcode == 8:
-            # equals
-            arg1, arg2, arg3 = self.mem[self.pos+1:self.pos+4]
-            mode1, mode2, mode3 = modes(3)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            debug("[{} == {} => {}]".format(v1, v2, arg3))
-            val = 1 if v1 == v2 else 0
-            self.write(arg3, mode3, val)
-            self.pos += 4
-        elif opcode == 9:
-            # adjust rb
-            arg1 = self.mem[self.pos+1]
-            mode1, = modes(1)
-            v1 = self.read(arg1, mode1)
-            debug("[rb += {}]".format(v1))
-            self.rb += v1
-            self.pos += 2
-        elif opcode == 99:
-            # Exit
-            self.pos = None
-        else:
-            assert False, "illegal opcode: {}".format(opcode)
+from intcode import Program, cache, checkpoint, compiler, image, load_program
+from intcode.disasm import disassemble
+from intcode.network import Network
+from intcode.profiler import BudgetExceeded, Profiler
+from intcode.scheduler import Scheduler
+from intcode.trace import ListTracer
 
 
 def test_add():
@@ -199,7 +46,7 @@ def test_read_write():
     ]
     p = Program(mem, [1])
     p.run()
-    assert p.out == [1]
+    assert list(p.out) == [1]
 
 def thrust(mem, seq):
     inp = 0
@@ -236,14 +83,406 @@ def test_quine():
     mem = [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
     p = Program(mem, [])
     p.run()
-    assert p.out == [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
+    assert list(p.out) == [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
+
+def test_self_modify():
+    # the second pass through the output instruction must see the patched arg
+    mem = [4,10, 1101,11,0,1, 1105,1,12, 99, 7, 8, 1005,22,9, 1101,1,0,22, 1106,0,0, 0]
+    p = Program(mem, [])
+    p.run()
+    assert list(p.out) == [7, 8]
+
+def test_trace():
+    t = ListTracer()
+    outputs = []
+    t.on(4, lambda vm, r: outputs.append(r.pos))
+    p = Program([1101,2,3,5, 4,0, 99], [], tracer=t)
+    p.run()
+    assert [r.op for r in t.records] == ["add", "out", "halt"]
+    assert t.records[0].args == (2, 3, 5)
+    assert outputs == [4]
+
+    # a read that blocks is traced once, when it runs after feed()
+    t = ListTracer()
+    p = Program([3,5, 4,5, 99], [], tracer=t)
+    p.run_until_input()
+    p.run_until_input()
+    p.feed([7])
+    p.run()
+    assert [r.op for r in t.records] == ["in", "out", "halt"] and list(p.out) == [7]
+
+def test_io():
+    # echo three inputs
+    mem = [3,0,4,0, 3,0,4,0, 3,0,4,0, 99]
+    p = Program(mem[:])
+    p.feed([1, 2, 3])
+    p.run()
+    assert p.drain() == [1, 2, 3]
+    assert p.drain() == []
+
+    p = Program(mem[:], [1, 2, 3], max_out=2)
+    p.run()
+    assert p.drain() == [2, 3]
+
+def test_paged():
+    mem = [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
+    p = Program(mem, [], memory="paged")
+    p.run()
+    assert list(p.out) == mem
+
+    # a far write only allocates the page it touches
+    p = Program([1101,5,6,10**9, 4,10**9, 4,10**9+1, 99], [], memory="paged")
+    p.run()
+    assert list(p.out) == [11, 0]
+    assert len(p.mem.pages) == 2
+
+def test_fork():
+    mem = [3,26,1001,26,-4,26,3,27,1002,27,2,27,1,27,26,27,4,27,1001,28,-1,28,1005,28,6,99,0,0,5]
+    for memory in ("list", "paged"):
+        p = Program(mem[:], [5, 0], memory=memory)
+        assert p.run_until_output() == 1
+        snap = p.snapshot()
+        q = p.fork()
+
+        p.feed([5])
+        assert p.run_until_output() == 11
+        q.feed([7])
+        assert q.run_until_output() == 15
+        assert p.load(27) == 11 and q.load(27) == 15
+
+        p.restore(snap)
+        p.feed([7])
+        assert p.run_until_output() == 15
+        assert snap.mem[27] == 1
+
+        # a snapshot of code the program patched, restored into a compiled machine
+        patch = [109,17, 21101,5,0,1, 3,31, 1105,1,16, 99,0,0,0,0, 1101,1,2,30, 4,30, 99]
+        p = Program(patch[:], memory=memory, compiled=True)
+        p.run_until_input()
+        q = Program(patch[:], memory=memory, compiled=True)
+        q.restore(p.snapshot())
+        q.feed([0])
+        q.run()
+        assert list(q.out) == [6]
+
+def test_compiled():
+    for memory in ("list", "paged"):
+        mem = [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
+        p = Program(mem[:], [], memory=memory, compiled=True)
+        p.run()
+        assert list(p.out) == mem
+
+        # writes into compiled operands are read back
+        p = Program([4,10, 1101,11,0,1, 1105,1,12, 99, 7, 8, 1005,22,9, 1101,1,0,22, 1106,0,0, 0],
+                    [], memory=memory, compiled=True)
+        p.run()
+        assert list(p.out) == [7, 8]
+
+        # the cells after a jump that is always taken are data
+        p = Program([1105,1,5, 1,1, 109,4, 21101,9,0,-1, 99], [], memory=memory, compiled=True)
+        p.run()
+        assert p.load(3) == 9 and p._compiled is not None
+
+        # -1 % 100 == 99 halts
+        p = Program([1,0,0,0,-1], memory=memory, compiled=True)
+        p.run()
+        assert p.load(0) == 2 and p.is_done()
+
+        # an instruction past the end of the image reads zeroes as arguments
+        mem = [209,2,1106,9,9,99,2001,9,9,9,207,9,8,7]
+        p = Program(mem[:], [21], memory=memory, compiled=True)
+        p.run()
+        q = Program(mem[:], [21], memory=memory)
+        q.run()
+        assert list(p.out) == list(q.out) and p.load(7) == q.load(7) and p.is_done()
+
+    p = Program([1,0,0,0,-1], tracer=ListTracer())
+    p.run()
+    assert p.load(0) == 2 and p.is_done()
 
+    mem = [3,26,1001,26,-4,26,3,27,1002,27,2,27,1,27,26,27,4,27,1001,28,-1,28,1005,28,6,99,0,0,5]
+    p = Program(mem, [5], compiled=True)
+    p.feed([0])
+    assert p.run_until_output() == 1
+    p.feed([5])
+    assert p.run_until_output() == 11
+
+    # compiled code is cached on disk, up to a size
+    with tempfile.TemporaryDirectory() as d:
+        cache_dir, compiler.CACHE_DIR = compiler.CACHE_DIR, d
+        try:
+            for i in range(3):
+                compiler.compile_program([104, 7000 + i, 99])
+            assert len(os.listdir(d)) == 3
+            compiler.evict(0)
+            assert os.listdir(d) == []
+        finally:
+            compiler.CACHE_DIR = cache_dir
+
+def test_network():
+    echo = [3,7,4,7,1105,1,0,0]
+    double = [3,11,1002,11,2,11,4,11,1105,1,0,0]
+    net = Network()
+    a = net.add(Program(echo[:]))
+    b, c = net.add(Program(double[:])), net.add(Program(echo[:]))
+    net.connect(a, b)
+    net.connect(a, c)
+    outb, outc = net.sink(b), net.sink(c)
+    a.send([1, 2])
+    net.run()  # every machine waits for input
+    assert list(outb.values) == [2, 4] and list(outc.values) == [1, 2]
+    a.send([3])
+    net.run()
+    assert list(outb.values) == [2, 4, 6] and list(outc.values) == [1, 2, 3]
+
+def test_checkpoint():
+    mem = [3,26,1001,26,-4,26,3,27,1002,27,2,27,1,27,26,27,4,27,1001,28,-1,28,1005,28,6,99,0,0,5]
+    for memory, compiled in (("list", False), ("paged", False), ("list", True)):
+        p = Program(mem[:], [5, 0], memory=memory, compiled=compiled)
+        assert p.run_until_output() == 1
+        p.feed([5, 7])
+        q = checkpoint.loads(checkpoint.dumps(p))
+        assert q.memory == memory and (q._compiled is not None) == compiled
+        assert q.run_until_output() == p.run_until_output() == 11
+        assert q.run_until_output() == p.run_until_output() == 15
+        assert [q.load(i) for i in range(29)] == [p.load(i) for i in range(29)]
+
+    p = Program([104,2**70, 1101,-3,0,10**9, 99], [-2**80], memory="paged")
+    p.run()
+    q = checkpoint.loads(checkpoint.dumps(p))
+    assert q.is_done() and list(q.inp) == [-2**80] and list(q.out) == [2**70]
+    assert q.load(10**9) == -3 and len(q.mem.pages) == 2
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "vm.ckpt")
+        p.save(path)
+        assert Program.resume(path).load(10**9) == -3
+
+def test_profile():
+    mem = [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
+    prof = Profiler()
+    p = Program(mem[:], [], tracer=prof)
+    p.run()
+    assert list(p.out) == mem
+    assert prof.retired == sum(prof.opcodes.values()) == sum(prof.pcs.values()) == 16 * 5 + 1
+    assert prof.opcodes[4] == 16 and prof.writes[100] == 16 and prof.reads[101] == 16
+    assert prof.hot(1) == [(0, 16)]
+    assert prof.to_dict()["opcodes"]["halt"] == 1
+    assert "out;2 16" in prof.folded().splitlines()
+
+    p = Program(mem[:], [], tracer=Profiler(budget=20))
+    try:
+        p.run()
+        assert False, "budget not enforced"
+    except BudgetExceeded:
+        assert p.tracer.retired == 20 and len(p.out) == 4
+    p.tracer.budget = None
+    p.run()
+    assert list(p.out) == mem
+
+def test_disasm():
+    # 0: jt 1 3 / 3: out [11] / 5: add [11] 1 [4] / 9: halt / 10: data
+    d = disassemble([1105,1,3, 4,11, 1001,11,1,4, 99, 0, 7])
+    assert sorted(d.blocks) == [0, 3]
+    assert d.blocks[0].succ == [3] and d.blocks[3].succ == []
+    assert [i.op for i in d.blocks[3].instructions] == ["out", "add", "halt"]
+    assert d.modified == [(4, 5)] and d.data == [(10, 12)]
+    assert "*     3: out [11]" in d.format().splitlines()
+
+    # pushes the return address 9 and returns through it
+    d = disassemble([109,10, 21101,9,0,0, 1105,1,12, 99, 0,0, 2106,0,0])
+    assert sorted(d.blocks) == [0, 9, 12]
+    assert d.blocks[0].succ == [12] and d.blocks[12].indirect and d.blocks[12].succ == []
+    assert d.relative_writes == [2]
+
+def test_streaming():
+    mem = [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
+    p = Program(mem[:], [])
+    assert list(p.outputs(4)) == [tuple(mem[i:i + 4]) for i in range(0, 16, 4)]
+
+    # reads two values and outputs their sum and product, forever
+    mem = [3,20, 3,21, 1,20,21,22, 2,20,21,23, 4,22, 4,23, 1105,1,0]
+    pulled = iter([1, 2, 3, 4])
+    p = Program(mem[:], [], on_input=lambda: next(pulled, None))
+    assert list(p.outputs(2)) == [(3, 2), (7, 12)]
+    assert p.needs_input()
+    p.feed([5, 6])
+    it = p.outputs(3)
+    assert next(it, None) is None and list(p.out) == [11, 30]
+
+def test_fusion():
+    # the first add writes the second operand of the next one
+    p = Program([1101,100,0,6, 1101,2,3,11, 4,11, 99, 0])
+    p.run()
+    assert list(p.out) == [102]
+
+    # 0: add [20] 1 [20] / 4: lt [20] 5 [21] / 8: jt [21] 0 / 11: out [20] / 13: halt
+    mem = [1001,20,1,20, 1007,20,5,21, 1005,21,0, 4,20, 99] + [0] * 8
+    p = Program(mem[:])
+    assert p.run_until_output() == 5
+    assert p._code[0][0].fused and p._code[0][0].words == (1001, 1007, 1005)
+    p.store(6, 8)
+    p.store(20, 0)
+    p.pos = 0
+    assert p.run_until_output() == 8
+
+    p = Program(mem[:])
+    p.step()
+    assert p.pos == 4 and p.mem[20] == 1
+
+def test_cache():
+    with tempfile.TemporaryDirectory() as d:
+        results = cache.ResultCache(d, max_bytes=400)
+        mem = [3,9,8,9,10,9,4,9,99,-1,8]
+        assert list(results.run(mem, [8]).out) == [1] and results.misses == 1
+        p = results.run(mem, [8])
+        assert list(p.out) == [1] and p.is_done() and results.hits == 1
+        assert list(results.run(mem, [7]).out) == [0] and results.misses == 2
+        assert mem[9] == -1
+
+        # blocked machines are cached too, and can go on
+        p = results.run(mem)
+        assert p.needs_input() and results.run(mem).needs_input() and results.hits == 2
+        p.feed([8])
+        p.run()
+        assert list(p.out) == [1]
+
+        assert len(os.listdir(results.path)) == 3
+        results.max_bytes = 200
+        results.evict()
+        assert len(os.listdir(results.path)) < 3
+        results.clear()
+        assert os.listdir(results.path) == []
+        results.run(mem, [8], cache=False)
+        assert os.listdir(results.path) == [] and results.misses == 3
+
+        # the arguments that change the machine are part of the key
+        results.max_bytes = cache.MAX_BYTES
+        quine = [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
+        assert list(results.run(quine, max_out=1).out) == [99]
+        assert list(results.run(quine).out) == quine
+        p = results.run(quine, memory="paged")
+        assert p.memory == "paged" and list(p.out) == quine
+
+        # corrupt entries are misses
+        path = results._file(results.key(quine, []))
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) // 2)
+        misses = results.misses
+        assert list(results.run(quine).out) == quine and results.misses == misses + 1
+
+def test_image():
+    mem = [109,1,204,-1, 2**70, -2**63, 99]
+    data = image.encode(mem, 10, 20)
+    assert image.decode(data, 10, 20) == mem
+    assert image.decode(data, 11, 20) is None  # the text changed
+
+    with tempfile.TemporaryDirectory() as d:
+        cache_dir, compiler.CACHE_DIR = compiler.CACHE_DIR, d
+        try:
+            path = os.path.join(d, "input")
+            with open(path, "w") as f:
+                f.write("1,0,0,0,99\n")
+            assert load_program(path) == load_program(path) == [1, 0, 0, 0, 99]
+            assert len(os.listdir(os.path.join(d, "images"))) == 1
+            with open(path, "w") as f:
+                f.write("2,0,0,0,99,7\n")
+            assert load_program(path) == [2, 0, 0, 0, 99, 7]
+        finally:
+            compiler.CACHE_DIR = cache_dir
+
+def test_watch():
+    mem = [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
+    p = Program(mem[:], compiled=True)
+    writes, reads, hits = [], [], []
+    p.watch(100, lambda vm, addr, v: writes.append(v))
+    p.watch(101, lambda vm, addr, v: reads.append(v), write=False, read=True)
+    p.break_at(15, lambda vm, pos: hits.append((pos, vm.load(100))))
+    p.run()
+    assert list(p.out) == mem
+    assert writes == list(range(1, 17)) and reads == [0] * 15 + [1] and hits == [(15, 16)]
+
+    # a watch that patches memory, and relative reads of a watched cell
+    p = Program(mem[:])
+    p.watch(100, lambda vm, addr, v: vm.store(100, 15) if v == 3 else None)
+    seen = []
+    p.watch(3, lambda vm, addr, v: seen.append((vm.rb, v)), write=False, read=True)
+    p.run()
+    assert list(p.out) == mem[:4] and seen == [(4, -1)]
+
+    # forks keep the hooks until they are removed
+    forked = []
+    r = Program(mem[:])
+    r.watch(100, lambda vm, addr, v: forked.append(v))
+    r.fork().run()
+    assert forked == list(range(1, 17))
+
+    q = p.fork()
+    q.unwatch(100)
+    q.clear_break(15)
+    q.pos = 0
+    q.store(100, 2)
+    q.run()
+    assert list(q.out)[4:] == mem[4:] + [0, 0]
+
+    # breakpoints set after a fork stay with the machine they were set on
+    late = []
+    p = Program(mem[:])
+    p.break_at(15, lambda vm, pos: hits.append(vm))
+    p.run()
+    q = p.fork()
+    p.break_at(15, lambda vm, pos: late.append(vm))
+    q.pos = 0
+    q.store(100, 2)
+    q.run()
+    assert hits[-2:] == [p, q] and late == []
+
+
+def test_scheduler():
+    # forwards (x, y) to the next address as (x + 1, y)
+    nic = [3,100, 3,101, 3,102, 1001,100,1,103, 4,103, 1001,101,1,101, 4,101, 4,102, 1105,1,2]
+    s = Scheduler()
+    for i in range(50):
+        s.add(Program(nic[:]), inp=[i])
+    got = []
+    s.route(50, got.append)
+    assert not s.run() and s.deadlocked and len(s.blocked) == 50
+    s.send(0, [0, 7])
+    s.send(20, [0, 8])
+    s.send(77, [1, 2])
+    s.run()
+    assert sorted(got) == [(30, 8), (50, 7)] and s.dropped == [(77, (1, 2))]
+    assert s.slices == 50 + 50 + 30  # machines only run when they have packets
+
+    # a polling machine sends (99, n) for every empty read, until told to stop
+    poll = [3,100, 1008,100,-1,101, 1006,101,20, 104,99, 1001,103,1,103, 4,103, 1105,1,0, 99]
+    s = Scheduler(size=2, empty=-1)
+    s.add(Program(poll[:]))
+    s.route(99, lambda packet: s.stop() if packet == (3,) else None)
+    assert s.run() and not s.blocked
+    s.send(0, [5])
+    assert not s.run() and s.halted == {0}
+
+    # fixed routes run a ring
+    mem = [3,26,1001,26,-4,26,3,27,1002,27,2,27,1,27,26,27,4,27,1001,28,-1,28,1005,28,6,99,0,0,5]
+    s = Scheduler(quantum=1)
+    for i, phase in enumerate([9, 8, 7, 6, 5]):
+        s.add(Program(mem[:]), inp=[phase], to=(i + 1) % 5)
+    s.send(0, [0])
+    s.run()
+    assert s.halted == {0, 1, 2, 3, 4} and s.machines[0].inp[-1] == 139629729
+
+    # a machine looping without output gives up its turn after steps
+    for compiled in (False, True):
+        got = []
+        s = Scheduler(size=2, steps=100)
+        s.add(Program([1105,1,0], compiled=compiled))
+        s.add(Program([3,100, 104,99, 4,100, 99]), inp=[7])
+        s.route(99, lambda packet: (got.append(packet), s.stop()))
+        assert s.run() and got == [(7,)] and s.halted == {1} and 0 in s.runnable
 
 
 def run_tests():
-    global DEBUG
-    d = DEBUG
-    DEBUG = False
     test_add()
     test_mult()
     test_modes()
@@ -251,20 +490,31 @@ def run_tests():
     test_thruster_1()
     test_thruster_2()
     test_quine()
-    DEBUG = d
+    test_self_modify()
+    test_trace()
+    test_io()
+    test_paged()
+    test_fork()
+    test_compiled()
+    test_network()
+    test_checkpoint()
+    test_profile()
+    test_disasm()
+    test_streaming()
+    test_fusion()
+    test_cache()
+    test_image()
+    test_watch()
+    test_scheduler()
 
 run_tests()
 
 def solve1():
-    mem = load_program()
-    p = Program(mem, [1])
-    p.run()
+    p = cache.run(load_program(), [1], compiled=True)
     print(p.out[0])
 
 def solve2():
-    mem = load_program()
-    p = Program(mem, [2])
-    p.run()
+    p = cache.run(load_program(), [2], compiled=True)
     print(p.out[0])
 
 solve1()
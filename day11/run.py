@@ -1,167 +1,11 @@
-from typing import List, Optional
-import sys
 import itertools
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
-
-def load_program() -> List[int]:
-    with open("input") as f:
-        return [int(n) for n in f.read().split(",")]
-
-
-class Program:
-    def __init__(self, mem, inp, *, debug=False):
-        self.mem = mem
-        self.inp = inp
-        self.out = []
-        self.pos = 0
-        self.rb = 0
-        self.debug = debug
-
-    def log(self, s):
-        if self.debug:
-            print(s, file=sys.stderr)
-
-
-    def run(self) -> None:
-        while self.pos is not None:
-            self.step()
-
-    def run_out(self) -> Optional[int]:
-        while self.pos is not None:
-            if self.out:
-                return self.out.pop(0)
-            self.step()
-        return None
-
-    def read(self, arg, mode) -> int:
-        if mode == 0:
-            if arg >= len(self.mem):
-                return 0  # uninitialized memory
-            return self.mem[arg]
-        elif mode == 1:
-            return arg
-        elif mode == 2:
-            addr = self.rb + arg
-            if addr >= len(self.mem):
-                return 0  # uninitialized memory
-            return self.mem[addr]
-
-        else:
-            assert False
-
-    def write(self, dest, mode, value) -> None:
-        assert mode == 0 or mode == 2
-        if mode == 2:
-            dest += self.rb
-
-        if dest >= len(self.mem):
-            self.mem.extend((0 for _ in range(dest - len(self.mem) + 100)))
-        self.mem[dest] = value
-
-    def step(self):
-        assert self.pos < len(self.mem), "program counter out of range: {}".format(self.pos)
-        assert self.pos >= 0, "program counter out of range: {}".format(self.pos)
-
-        opcode = self.mem[self.pos] % 100
-        def modes(n):
-            return ((self.mem[self.pos] // (100 * (10**i))) % 10 for i in range(n))
-
-        if opcode == 1:
-            # Add
-            arg1, arg2, arg3 = self.mem[self.pos+1:self.pos+4]
-            mode1, mode2, mode3 = modes(3)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            self.log("[{} + {} => {}]".format(v1, v2, arg3))
-            self.write(arg3, mode3, v1 + v2)
-            self.pos += 4
-        elif opcode == 2:
-            # Mult
-            arg1, arg2, arg3 = self.mem[self.pos+1:self.pos+4]
-            mode1, mode2, mode3 = modes(3)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            self.log("[{} * {} => {}]".format(v1, v2, arg3))
-            self.write(arg3, mode3, v1 * v2)
-            self.pos += 4
-        elif opcode == 3:
-            # Read
-            arg1 = self.mem[self.pos+1]
-            mode1, = modes(1)
-            assert mode1 == 0 or mode1 == 2
-
-            self.log("[read => {}]".format(arg1))
-            self.write(arg1, mode1, self.inp.pop(0))
-            self.pos += 2
-        elif opcode == 4:
-            # Write
-            arg1 = self.mem[self.pos+1]
-            mode1, = modes(1)
-            v1 = self.read(arg1, mode1)
-            self.log("[write {}]".format(v1))
-            self.out.append(v1)
-            self.pos += 2
-        elif opcode == 5:
-            # jump-if-true
-            arg1, arg2 = self.mem[self.pos+1:self.pos+3]
-            mode1, mode2 = modes(2)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            self.log("[if {} goto {}]".format(v1, v2))
-            if v1 != 0:
-                self.pos = v2
-            else:
-                self.pos += 3
-        elif opcode == 6:
-            # jump-if-false
-            arg1, arg2 = self.mem[self.pos+1:self.pos+3]
-            mode1, mode2 = modes(2)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            self.log("[if-not {} goto {}]".format(v1, v2))
-            if v1 == 0:
-                self.pos = v2
-            else:
-                self.pos += 3
-        elif opcode == 7:
-            # less than
-            arg1, arg2, arg3 = self.mem[self.pos+1:self.pos+4]
-            mode1, mode2, mode3 = modes(3)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            self.log("[{} < {} => {}]".format(v1, v2, arg3))
-            val = 1 if v1 < v2 else 0
-            self.write(arg3, mode3, val)
-            self.pos += 4
-        elif opcode == 8:
-            # equals
-            arg1, arg2, arg3 = self.mem[self.pos+1:self.pos+4]
-            mode1, mode2, mode3 = modes(3)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            self.log("[{} == {} => {}]".format(v1, v2, arg3))
-            val = 1 if v1 == v2 else 0
-            self.write(arg3, mode3, val)
-            self.pos += 4
-        elif opcode == 9:
-            # adjust rb
-            arg1 = self.mem[self.pos+1]
-            mode1, = modes(1)
-            v1 = self.read(arg1, mode1)
-            self.log("[rb += {}]".format(v1))
-            self.rb += v1
-            self.pos += 2
-        elif opcode == 99:
-            # Exit
-            self.pos = None
-        else:
-            assert False, "illegal opcode: {}".format(opcode)
+from intcode import Program, load_program
+from intcode.grid import Grid
+from intcode.render import BW, ansi, pgm, raster, show, text
 
 
 def test_add():
@@ -198,7 +42,7 @@ def test_read_write():
     ]
     p = Program(mem, [1])
     p.run()
-    assert p.out == [1]
+    assert list(p.out) == [1]
 
 def thrust(mem, seq):
     inp = 0
@@ -235,7 +79,29 @@ def test_quine():
     mem = [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
     p = Program(mem, [])
     p.run()
-    assert p.out == [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
+    assert list(p.out) == [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
+
+def test_grid():
+    g = Grid(width=2, height=2)
+    assert g.bounds is None and len(g) == 0 and text(g, {0: "."}) == ""
+    g[0, 0] = 1
+    g[-5, 3] = 2
+    g[40, -7] = 1
+    g[0, 0] = 0
+    assert len(g) == 3 and (0, 0) in g and (1, 1) not in g
+    assert g[0, 0] == 0 and g[-5, 3] == 2 and g[1, 1] == 0 and g[1000, 1000] == 0
+    assert g.get((0, 0), 9) == 0 and g.get((1, 1), 9) == 9
+    assert g.bounds == (-5, -7, 40, 3)
+    assert sorted(g.items()) == [((-5, 3), 2), ((0, 0), 0), ((40, -7), 1)]
+    rows = text(g, {0: ".", 1: "#", 2: "@"}).splitlines()
+    assert len(rows) == 11 and all(len(r) == 46 for r in rows)
+    assert rows[0] == "." * 45 + "#" and rows[10] == "@" + "." * 45
+
+    # a dict is drawn the same
+    d = dict(g.items())
+    assert raster(d) == raster(g) and text(d, {0: ".", 1: "#", 2: "@"}) == text(g, {0: ".", 1: "#", 2: "@"})
+    assert pgm({(0, 0): 1, (2, 1): 2}, {1: 255}) == b"P5\n3 2\n255\n\xff\x00\x00\x00\x00\x02"
+    assert ansi(g, [(-5, 3)], {2: "@"}, origin=(-5, -7)) == "\x1b[11;1H@"
 
 def run_tests():
     test_add()
@@ -245,6 +111,7 @@ def run_tests():
     test_thruster_1()
     test_thruster_2()
     test_quine()
+    test_grid()
 
 def move(pos, dir, turn):
     if turn == 0:
@@ -272,57 +139,26 @@ def move(pos, dir, turn):
 run_tests()
 
 
-def display_coord_dict(coords):
-    def value_to_char(v):
-        return "█" if v == 0 else " "
-
-    default_v = 0
-    minx, miny = next(coords.keys().__iter__())
-    maxx, maxy = minx, miny
-
-    for x, y in coords:
-        if x < minx:
-            minx = x
-        if y < miny:
-            miny = y
-        if x > maxx:
-            maxx = x
-        if y > maxy:
-            maxy = y
-
-    for row in range(miny, maxy+1):
-        s = ""
-        for col in range(minx, maxx+1):
-            v = coords.get((col,row), default_v)
-            s += value_to_char(v)
-        print(s)
-
-
 def robot(mem, hull):
-    p = Program(mem, [])
     pos = (0, 0)
     dir = 0 # up
-    while True:
-        color = hull.get(pos, 0)
-        p.inp.append(color)
-
-        color = p.run_out()
-        if color == None:
-            break
+    p = Program(mem, [], compiled=True, on_input=lambda: hull.get(pos, 0))
+    for color, turn in p.outputs(2):
         hull[pos] = color
-        turn = p.run_out()
         pos, dir = move(pos, dir, turn)
     return hull
 
 
 def solve1():
-    hull = robot(load_program(), {})
+    hull = robot(load_program(), Grid())
     print(len(hull))
 
 
 def solve2():
-    hull = robot(load_program(), {(0,0): 1})
-    display_coord_dict(hull)
+    hull = Grid()
+    hull[0, 0] = 1
+    robot(load_program(), hull)
+    show(hull, BW)
 
 
 solve1()
@@ -1,178 +1,12 @@
-from typing import List, Optional
-import sys
+from collections import deque
 import itertools
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
-
-def load_program() -> List[int]:
-    with open("input") as f:
-        return [int(n) for n in f.read().split(",")]
-
-
-class Program:
-    def __init__(self, mem, inp, *, debug=False):
-        self.mem = mem
-        self.inp = inp
-        self.out = []
-        self.pos = 0
-        self.rb = 0
-        self.debug = debug
-
-    def log(self, s):
-        if self.debug:
-            print(s, file=sys.stderr)
-
-    def run(self) -> None:
-        while self.pos is not None:
-            self.step()
-
-    def run_out(self) -> Optional[int]:
-        while self.pos is not None:
-            if self.out:
-                return self.out.pop(0)
-            self.step()
-        return None
-
-    def run_in(self) -> None:
-        self.step()
-        while self.pos is not None:
-            opcode = self.mem[self.pos] % 100
-            if opcode == 3:
-                return
-            self.step()
-        return
-
-    def is_done(self) -> bool:
-        return self.pos is None
-
-    def read(self, arg, mode) -> int:
-        if mode == 0:
-            if arg >= len(self.mem):
-                return 0  # uninitialized memory
-            return self.mem[arg]
-        elif mode == 1:
-            return arg
-        elif mode == 2:
-            addr = self.rb + arg
-            if addr >= len(self.mem):
-                return 0  # uninitialized memory
-            return self.mem[addr]
-
-        else:
-            assert False
-
-    def write(self, dest, mode, value) -> None:
-        assert mode == 0 or mode == 2
-        if mode == 2:
-            dest += self.rb
-
-        if dest >= len(self.mem):
-            self.mem.extend((0 for _ in range(dest - len(self.mem) + 100)))
-        self.mem[dest] = value
-
-    def step(self):
-        assert self.pos < len(self.mem), "program counter out of range: {}".format(self.pos)
-        assert self.pos >= 0, "program counter out of range: {}".format(self.pos)
-
-        opcode = self.mem[self.pos] % 100
-        def modes(n):
-            return ((self.mem[self.pos] // (100 * (10**i))) % 10 for i in range(n))
-
-        if opcode == 1:
-            # Add
-            arg1, arg2, arg3 = self.mem[self.pos+1:self.pos+4]
-            mode1, mode2, mode3 = modes(3)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            self.log("[{} + {} => {}]".format(v1, v2, arg3))
-            self.write(arg3, mode3, v1 + v2)
-            self.pos += 4
-        elif opcode == 2:
-            # Mult
-            arg1, arg2, arg3 = self.mem[self.pos+1:self.pos+4]
-            mode1, mode2, mode3 = modes(3)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            self.log("[{} * {} => {}]".format(v1, v2, arg3))
-            self.write(arg3, mode3, v1 * v2)
-            self.pos += 4
-        elif opcode == 3:
-            # Read
-            arg1 = self.mem[self.pos+1]
-            mode1, = modes(1)
-            assert mode1 == 0 or mode1 == 2
-
-            self.log("[read => {}]".format(arg1))
-            self.write(arg1, mode1, self.inp.pop(0))
-            self.pos += 2
-        elif opcode == 4:
-            # Write
-            arg1 = self.mem[self.pos+1]
-            mode1, = modes(1)
-            v1 = self.read(arg1, mode1)
-            self.log("[write {}]".format(v1))
-            self.out.append(v1)
-            self.pos += 2
-        elif opcode == 5:
-            # jump-if-true
-            arg1, arg2 = self.mem[self.pos+1:self.pos+3]
-            mode1, mode2 = modes(2)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            self.log("[if {} goto {}]".format(v1, v2))
-            if v1 != 0:
-                self.pos = v2
-            else:
-                self.pos += 3
-        elif opcode == 6:
-            # jump-if-false
-            arg1, arg2 = self.mem[self.pos+1:self.pos+3]
-            mode1, mode2 = modes(2)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            self.log("[if-not {} goto {}]".format(v1, v2))
-            if v1 == 0:
-                self.pos = v2
-            else:
-                self.pos += 3
-        elif opcode == 7:
-            # less than
-            arg1, arg2, arg3 = self.mem[self.pos+1:self.pos+4]
-            mode1, mode2, mode3 = modes(3)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            self.log("[{} < {} => {}]".format(v1, v2, arg3))
-            val = 1 if v1 < v2 else 0
-            self.write(arg3, mode3, val)
-            self.pos += 4
-        elif opcode == 8:
-            # equals
-            arg1, arg2, arg3 = self.mem[self.pos+1:self.pos+4]
-            mode1, mode2, mode3 = modes(3)
-
-            v1 = self.read(arg1, mode1)
-            v2 = self.read(arg2, mode2)
-            self.log("[{} == {} => {}]".format(v1, v2, arg3))
-            val = 1 if v1 == v2 else 0
-            self.write(arg3, mode3, val)
-            self.pos += 4
-        elif opcode == 9:
-            # adjust rb
-            arg1 = self.mem[self.pos+1]
-            mode1, = modes(1)
-            v1 = self.read(arg1, mode1)
-            self.log("[rb += {}]".format(v1))
-            self.rb += v1
-            self.pos += 2
-        elif opcode == 99:
-            # Exit
-            self.pos = None
-        else:
-            assert False, "illegal opcode: {}".format(opcode)
+from intcode import Program, load_program
+from intcode.render import ansi, text
 
 
 def test_add():
@@ -209,7 +43,7 @@ def test_read_write():
     ]
     p = Program(mem, [1])
     p.run()
-    assert p.out == [1]
+    assert list(p.out) == [1]
 
 def thrust(mem, seq):
     inp = 0
@@ -246,7 +80,15 @@ def test_quine():
     mem = [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
     p = Program(mem, [])
     p.run()
-    assert p.out == [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
+    assert list(p.out) == [109,1,204,-1,1001,100,1,100,1008,100,16,101,1006,101,0,99]
+
+def test_ball_path():
+    # reads the joystick forever without drawing
+    blank = [3,10, 1105,1,0]
+    assert ball_path(Program(blank), 20, horizon=5) == []
+    # draws the ball at (1, y) for y = 1.. on the frames after the first
+    falling = [3,30, 1006,31,11, 104,1, 4,31, 104,4, 1001,31,1,31, 1105,1,0]
+    assert ball_path(Program(falling), 4) == [(1, 1), (1, 2), (1, 3)]
 
 def run_tests():
     test_add()
@@ -256,107 +98,160 @@ def run_tests():
     test_thruster_1()
     test_thruster_2()
     test_quine()
+    test_ball_path()
 
-def display_coord_dict(coords, *, char_map={0: " ", 1: "█", 2: "X", 3: "-", 4: "@"}):
-    default_v = 0
-    minx, miny = next(coords.keys().__iter__())
-    maxx, maxy = minx, miny
-
-    for x, y in coords:
-        if x < minx:
-            minx = x
-        if y < miny:
-            miny = y
-        if x > maxx:
-            maxx = x
-        if y > maxy:
-            maxy = y
-
-    for row in range(miny, maxy+1):
-        s = ""
-        for col in range(minx, maxx+1):
-            v = coords.get((col,row), default_v)
-            s += char_map[v]
-        print(s)
-
-def output(o):
-    m = {}
-    points = 0
-    ball = 0,0
-    paddle = 0,0
-    for i in range(0, len(o), 3):
-        x, y, v = o[i], o[i+1], o[i+2]
-        if x == -1 and y == 0:
-            points = v
-        else:
-            m[(x, y)] = v
+class Screen:
+    """
+    The tiles drawn so far, updated from new (x, y, tile) triples only.
+    changed holds the cells that changed since the last draw().
+    """
 
-        if v == 4:
-            ball = x,y
-        if v == 3:
-            paddle = x,y
-    display_coord_dict(m)
-    print("points: {}".format(points))
-    return ball,paddle
+    def __init__(self, char_map={0: " ", 1: "█", 2: "X", 3: "-", 4: "@"}):
+        self.char_map = char_map
+        self.tiles = {}
+        self.changed = set()
+        self.points = 0
+        self.ball = 0, 0
+        self.paddle = 0, 0
+        self.height = 0
+        self.last_draw = None
+
+    def update(self, triples):
+        tiles = self.tiles
+        for x, y, v in triples:
+            if x == -1 and y == 0:
+                self.points = v
+                continue
+            if tiles.get((x, y)) != v:
+                tiles[(x, y)] = v
+                self.changed.add((x, y))
+                if y >= self.height:
+                    self.height = y + 1
+
+            if v == 4:
+                self.ball = x, y
+            if v == 3:
+                self.paddle = x, y
+
+    def display(self, out=sys.stdout):
+        out.write(text(self.tiles, self.char_map) + "points: {}\n".format(self.points))
+
+    def draw(self, out=sys.stdout, fps=30, force=False):
+        """
+        Redraw the changed cells with ANSI escapes in one write, unless the
+        last draw was less than 1/fps seconds ago.
+        """
+        now = time.monotonic()
+        if not force and self.last_draw is not None and now - self.last_draw < 1 / fps:
+            return
+        clear = "\x1b[2J" if self.last_draw is None else ""
+        points = "\x1b[{};1Hpoints: {}\x1b[K\n".format(self.height + 1, self.points)
+        out.write(clear + ansi(self.tiles, self.changed, self.char_map) + points)
+        out.flush()
+        self.changed.clear()
+        self.last_draw = now
 
 def solve1():
     mem = load_program()
-    p = Program(mem, [])
-    p.run()
-    print(sum(1 for i, v in enumerate(p.out) if i % 3 == 2 and v == 2))
+    p = Program(mem, [], compiled=True)
+    print(sum(1 for _, _, v in p.outputs(3) if v == 2))
 
 def interactive():
     mem = load_program()
     mem[0] = 2
-    p = Program(mem, [])
-    p.run_in()
-    _, (px, _) = output(p.out)
-
-    while not p.is_done():
-        ball, (paddle, _) = output(p.out)
+    screen = Screen()
 
+    def joystick():
+        screen.display()
         move = int(input())
 
-        print("ball: {}".format(ball))
-        print("paddle: {}".format(paddle))
+        print("ball: {}".format(screen.ball))
+        print("paddle: {}".format(screen.paddle[0]))
         print("move: {}".format(move))
-        p.inp.append(move)
+        return move
 
-        p.run_in()
+    p = Program(mem, [], compiled=True, on_input=joystick)
+    screen.update(p.outputs(3))
+    screen.display()
 
-def solve2():
+def ball_path(vm, paddle_y, move=0, horizon=1000):
+    """
+    The ball positions after each of the next frames of vm, up to the one
+    where it reaches the row above the paddle, from a fork given move and
+    then run with the joystick held still. The ball does not touch the
+    paddle before then, so every later sequence of moves gives the same
+    frames, and one fork stands for all of them. Empty if the game ends
+    first, or no ball was drawn before it did or the horizon ran out.
+    Frames before the fork first draws the ball are left out.
+
+    The ball is followed by the (x, y, 4) tiles the fork outputs, as on
+    the screen, not by reading its memory.
     """
-    mem[388] = ball_x
-    mem[389] = ball_y
-    mem[390] = ball_vx
-    mem[391] = ball_vy
+    sim = vm.fork()
+    sim.out.clear()
+    path = []
+    ball = None
+    for _ in range(horizon):
+        sim.inp.append(move)
+        move = 0
+        sim.run_until_input()
+        if sim.is_done():
+            return []
+        for x, y, v in zip(*[iter(sim.out)] * 3):
+            if v == 4 and x >= 0:
+                ball = x, y
+        sim.out.clear()
+        if ball is None:
+            continue  # not drawn yet
+        path.append(ball)
+        if ball[1] == paddle_y - 1:
+            return path
+    return []
+
+def solve2(render=False):
+    """
+    Plays the game by forking the machine to see where the ball comes down
+    and moving the paddle there. The predicted frames are kept and checked
+    against the real ones, and the game is only simulated again when they
+    run out or differ.
+
+    Runs headless, printing the final screen, or with render drawing the
+    game as it goes.
     """
     mem = load_program()
     mem[0] = 2
-    p = Program(mem, [])
-    p.run_in()
-    _, (px, _) = output(p.out)
-
-    def deb(pos):
-        print("mem[{}] = {}".format(pos, mem[pos]))
-
-    inputs = []
-    while not p.is_done():
-        ball, (paddle, _) = output(p.out)
-
-        deb(388)
-        deb(389)
-        deb(390)
-        deb(391)
-
-        # bounce
-        if mem[391] == 1 and mem[389] == 18:
-            mem[391] = -1
-
-        p.inp.append(0)
-
-        p.run_in()
-    ball, (paddle, _) = output(p.out)
+    p = Program(mem, [], compiled=True)
+    screen = Screen()
+    path = deque()
+    while True:
+        # a whole frame at a time, outputs(3) stops after every value
+        p.run_until_input()
+        screen.update(zip(*[iter(p.out)] * 3))
+        p.out.clear()
+        if render:
+            screen.draw()
+        if p.is_done():
+            break
+
+        if path and path.popleft() != screen.ball:
+            path.clear()  # mispredicted
+        x, y = screen.paddle
+        bx, by = screen.ball
+        if by == y - 1:
+            target = bx  # the paddle has to be under the ball after this move
+        else:
+            if not path:
+                path.extend(ball_path(p, y))
+            target = path[-1][0] if path else x
+        move = (target > x) - (target < x)
+        if not path:
+            path.extend(ball_path(p, y, move))
+        p.inp.append(move)
+    if render:
+        screen.draw(force=True)
+    else:
+        screen.display()
 
+run_tests()
 solve1()
-solve2()
+solve2(render="--render" in sys.argv[1:])
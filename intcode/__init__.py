@@ -0,0 +1 @@
+from .program import Program, load_program
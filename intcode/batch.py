@@ -0,0 +1,148 @@
+"""
+Run many instances of one Intcode image in lockstep with NumPy.
+
+Every instance has its own row of memory, program counter and relative
+base. Each step groups the running instances by program counter and
+instruction word, and executes every group as one vectorized operation,
+so instances that take different branches are simply run in different
+groups until they meet again.
+
+Values must fit in 64 bits, additions and multiplications that would
+overflow fail an assertion.
+"""
+from collections import deque
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+_LIMIT = 2.0 ** 62
+
+
+class Batch:
+    def __init__(self, image: Sequence[int], n: int, inputs: Optional[Iterable[Iterable[int]]] = None):
+        self.n = n
+        self.mem = np.tile(np.array(image, dtype=np.int64), (n, 1))
+        self.pos = np.zeros(n, dtype=np.int64)
+        self.rb = np.zeros(n, dtype=np.int64)
+        self.halted = np.zeros(n, dtype=bool)
+        self.blocked = np.zeros(n, dtype=bool)
+        self.inp = [deque(i) for i in inputs] if inputs is not None else [deque() for _ in range(n)]
+        assert len(self.inp) == n, "need one input sequence per instance"
+        self.out = [[] for _ in range(n)]  # type: List[List[int]]
+        self.steps = 0
+
+    def set(self, addr: int, values) -> None:
+        """Set mem[addr] of every instance, values is a scalar or one value per instance"""
+        self._grow(addr)
+        self.mem[:, addr] = values
+
+    def get(self, addr: int) -> np.ndarray:
+        """mem[addr] of every instance"""
+        if addr >= self.mem.shape[1]:
+            return np.zeros(self.n, dtype=np.int64)
+        return self.mem[:, addr].copy()
+
+    def _grow(self, addr) -> None:
+        width = self.mem.shape[1]
+        if addr >= width:
+            extra = max(addr + 1 - width, width // 2)
+            self.mem = np.pad(self.mem, ((0, 0), (0, extra)))
+
+    def _read(self, rows, addrs) -> np.ndarray:
+        assert (addrs >= 0).all(), "negative address"
+        inside = addrs < self.mem.shape[1]
+        if inside.all():
+            return self.mem[rows, addrs]
+        v = np.zeros(len(rows), dtype=np.int64)
+        v[inside] = self.mem[rows[inside], addrs[inside]]
+        return v  # uninitialized memory
+
+    def _param(self, rows, pc, i, mode) -> np.ndarray:
+        arg = self.mem[rows, pc + i]
+        if mode == 0:
+            return self._read(rows, arg)
+        elif mode == 1:
+            return arg
+        elif mode == 2:
+            return self._read(rows, self.rb[rows] + arg)
+        assert False, "illegal read mode: {}".format(mode)
+
+    def _dest(self, rows, pc, i, mode) -> np.ndarray:
+        arg = self.mem[rows, pc + i]
+        assert mode == 0 or mode == 2, "illegal write mode: {}".format(mode)
+        if mode == 2:
+            arg = arg + self.rb[rows]
+        assert (arg >= 0).all(), "negative address"
+        self._grow(int(arg.max()))
+        return arg
+
+    def _exec(self, rows, pc, ins) -> None:
+        """Execute instruction word ins at pc for the instances in rows"""
+        opcode = ins % 100
+        modes = (ins // 100 % 10, ins // 1000 % 10, ins // 10000 % 10)
+        p = lambda i: self._param(rows, pc, i + 1, modes[i])
+        d = lambda i: self._dest(rows, pc, i + 1, modes[i])
+
+        if opcode in (1, 2):
+            x, y = p(0), p(1)
+            fx, fy = x.astype(float), y.astype(float)
+            bound = np.abs(fx + fy) if opcode == 1 else np.abs(fx * fy)
+            assert (bound < _LIMIT).all(), "value overflows int64 at {}".format(pc)
+            dest = d(2)
+            self.mem[rows, dest] = x + y if opcode == 1 else x * y
+            self.pos[rows] = pc + 4
+        elif opcode == 3:
+            ready = np.array([bool(self.inp[r]) for r in rows], dtype=bool)
+            self.blocked[rows[~ready]] = True
+            rows = rows[ready]
+            if len(rows):
+                values = np.array([self.inp[r].popleft() for r in rows], dtype=np.int64)
+                dest = d(0)
+                self.mem[rows, dest] = values
+                self.pos[rows] = pc + 2
+        elif opcode == 4:
+            for r, v in zip(rows, p(0).tolist()):
+                self.out[r].append(v)
+            self.pos[rows] = pc + 2
+        elif opcode in (5, 6):
+            cond, target = p(0), p(1)
+            jump = cond != 0 if opcode == 5 else cond == 0
+            self.pos[rows] = np.where(jump, target, pc + 3)
+        elif opcode in (7, 8):
+            x, y = p(0), p(1)
+            dest = d(2)
+            self.mem[rows, dest] = (x < y if opcode == 7 else x == y).astype(np.int64)
+            self.pos[rows] = pc + 4
+        elif opcode == 9:
+            self.rb[rows] += p(0)
+            self.pos[rows] = pc + 2
+        elif opcode == 99:
+            self.halted[rows] = True
+        else:
+            assert False, "illegal opcode: {} at {}".format(opcode, pc)
+
+    def step(self) -> bool:
+        """Execute one instruction in every running instance, False if none is running"""
+        active = np.flatnonzero(~(self.halted | self.blocked))
+        if not len(active):
+            return False
+        pcs = self.pos[active]
+        for pc in np.unique(pcs).tolist():
+            rows = active[pcs == pc]
+            self._grow(pc + 3)
+            words = self.mem[rows, pc]
+            for ins in np.unique(words).tolist():
+                self._exec(rows[words == ins], pc, ins)
+        self.steps += 1
+        return True
+
+    def feed(self, i: int, values: Iterable[int]) -> None:
+        """Queue input for instance i"""
+        self.inp[i].extend(values)
+        self.blocked[i] = False
+
+    def run(self) -> None:
+        """Run until every instance has halted or is blocked on input"""
+        while self.step():
+            pass
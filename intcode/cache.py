@@ -0,0 +1,121 @@
+"""
+Remember the results of deterministic Intcode runs on disk.
+
+run(image, inp) runs a machine until it halts or needs more input and
+returns it. The final machine is saved as a checkpoint, see
+intcode.checkpoint, keyed by a hash of the image and the input, so the
+next run of the same job, in this or a later process, only loads it.
+
+Entries live in $INTCODE_CACHE/results, or ~/.cache/intcode/results.
+Every hit marks its entry as recently used, and the least recently used
+entries are removed when all of them take more than max_bytes.
+INTCODE_NO_CACHE=1 turns the cache off, and cache=False skips it for one
+run. The key also holds the memory backend, compiled and max_out. Runs
+with a tracer, debug or an on_input callback are never cached, since
+their result can depend on more than the image and the input.
+"""
+from typing import Iterable, List, Optional
+import hashlib
+import os
+import struct
+import zlib
+
+from . import checkpoint
+from .compiler import CACHE_DIR
+from .program import Program
+
+
+MAX_BYTES = 64 << 20
+
+# Program arguments that change the machine a run leaves, and are part of the key
+_KEYED = ("memory", "compiled", "max_out")
+
+
+class ResultCache:
+    def __init__(self, path=os.path.join(CACHE_DIR, "results"), max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, image: List[int], inp: Iterable[int], memory="list", compiled=False, max_out=None) -> str:
+        s = "{} {} {} {} {} | {}".format(checkpoint.VERSION, memory, bool(compiled), max_out,
+                                         ",".join(map(str, image)), ",".join(map(str, inp)))
+        return hashlib.sha256(s.encode()).hexdigest()
+
+    def _file(self, key) -> str:
+        return os.path.join(self.path, key + ".ckpt")
+
+    def get(self, key: str) -> Optional[Program]:
+        path = self._file(key)
+        try:
+            vm = checkpoint.load(path)
+            os.utime(path)  # most recently used
+        except (OSError, AssertionError, EOFError, ValueError, struct.error, zlib.error):
+            return None  # missing or corrupt
+        return vm
+
+    def put(self, key: str, vm: Program) -> None:
+        path = self._file(key)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            tmp = "{}.{}".format(path, os.getpid())
+            checkpoint.save(vm, tmp)
+            os.replace(tmp, path)
+            self.evict()
+        except OSError:
+            pass  # no cache, run again next time
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until they fit in max_bytes"""
+        entries = []
+        for e in os.scandir(self.path):
+            if e.name.endswith(".ckpt"):
+                st = e.stat()
+                entries.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # removed by another process
+            total -= size
+
+    def clear(self) -> None:
+        max_bytes, self.max_bytes = self.max_bytes, -1
+        try:
+            self.evict()
+        except OSError:
+            pass
+        self.max_bytes = max_bytes
+
+    def run(self, image: List[int], inp: Iterable[int] = (), *, cache=True, **kwargs) -> Program:
+        """
+        Program(image, inp, **kwargs) run until it halts or needs input,
+        from the cache if this job ran before. image is not modified.
+        """
+        inp = list(inp)
+        cache = (cache and os.environ.get("INTCODE_NO_CACHE", "") in ("", "0")
+                 and not any(kwargs.get(k) for k in ("tracer", "on_input", "debug")))
+        if cache:
+            key = self.key(image, inp, **{k: v for k, v in kwargs.items() if k in _KEYED})
+            vm = self.get(key)
+            if vm is not None:
+                self.hits += 1
+                return vm
+            self.misses += 1
+        vm = Program(image[:], inp, **kwargs)
+        vm.run_until_input()
+        if cache:
+            self.put(key, vm)
+        return vm
+
+
+default = ResultCache()
+
+
+def run(image: List[int], inp: Iterable[int] = (), **kwargs) -> Program:
+    """ResultCache.run on the default cache"""
+    return default.run(image, inp, **kwargs)
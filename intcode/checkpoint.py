@@ -0,0 +1,155 @@
+"""
+Save running Intcode machines to a compact binary checkpoint and resume
+them later, in this or another process.
+
+A checkpoint holds the memory backend, pos, rb, queued input and output,
+and memory in pages of PAGE_SIZE cells. Pages of zeroes are left out and
+every other page is compressed on its own. Cells are stored as 64 bit
+integers when they all fit, and as variable length integers otherwise.
+Tracers are not saved.
+"""
+from array import array
+from typing import BinaryIO, List
+import io
+import struct
+import zlib
+
+from .memory import PAGE_BITS, PAGE_SIZE, PagedMemory
+from .program import Program
+
+
+MAGIC = b"ICKP"
+VERSION = 1
+
+# version, flags, pos, rb, max_out, memory size, number of pages
+_HEADER = struct.Struct("<BBqqqqI")
+_PAGED, _COMPILED, _HALTED = 1, 2, 4
+_INT64 = (-(1 << 63), (1 << 63) - 1)
+
+
+def _encode(values: List[int]) -> bytes:
+    if all(_INT64[0] <= v <= _INT64[1] for v in values):
+        return b"q" + array("q", values).tobytes()
+    out = bytearray(b"v")
+    for v in values:
+        v = v * 2 if v >= 0 else -v * 2 - 1  # zigzag
+        while v > 0x7f:
+            out.append(v & 0x7f | 0x80)
+            v >>= 7
+        out.append(v)
+    return bytes(out)
+
+
+def _decode(data: bytes) -> List[int]:
+    if data[:1] == b"q":
+        a = array("q")
+        a.frombytes(data[1:])
+        return a.tolist()
+    assert data[:1] == b"v", "corrupt checkpoint"
+    values = []
+    v = shift = 0
+    for byte in data[1:]:
+        v |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            values.append(v >> 1 if v & 1 == 0 else -(v >> 1) - 1)
+            v = shift = 0
+    return values
+
+
+def _write_block(f: BinaryIO, values: List[int]) -> None:
+    data = zlib.compress(_encode(values))
+    f.write(struct.pack("<I", len(data)))
+    f.write(data)
+
+
+def _read_block(f: BinaryIO) -> List[int]:
+    n, = struct.unpack("<I", f.read(4))
+    return _decode(zlib.decompress(f.read(n)))
+
+
+def _pages(vm: Program):
+    """(page number, cells) of every page holding something else than zeroes"""
+    if vm.memory == "paged":
+        pages = sorted(vm.mem.pages.items())
+    else:
+        mem = vm.mem
+        pages = [(start >> PAGE_BITS, mem[start:start + PAGE_SIZE]) for start in range(0, len(mem), PAGE_SIZE)]
+    return [(i, page) for i, page in pages if any(page)]
+
+
+def _write(vm: Program, f: BinaryIO) -> None:
+    flags = 0
+    if vm.memory == "paged":
+        flags |= _PAGED
+    if vm._compiled is not None:
+        flags |= _COMPILED
+    if vm.pos is None:
+        flags |= _HALTED
+    size = len(vm.mem) if vm.memory == "list" else 0
+    max_out = vm.out.maxlen if vm.out.maxlen is not None else -1
+    pages = _pages(vm)
+
+    f.write(MAGIC)
+    f.write(_HEADER.pack(VERSION, flags, vm.pos or 0, vm.rb, max_out, size, len(pages)))
+    _write_block(f, list(vm.inp))
+    _write_block(f, list(vm.out))
+    for i, page in pages:
+        f.write(struct.pack("<q", i))
+        _write_block(f, list(page))
+
+
+def _read(f: BinaryIO) -> Program:
+    assert f.read(len(MAGIC)) == MAGIC, "not an Intcode checkpoint"
+    version, flags, pos, rb, max_out, size, n = _HEADER.unpack(f.read(_HEADER.size))
+    assert version == VERSION, "unsupported checkpoint version: {}".format(version)
+    inp = _read_block(f)
+    out = _read_block(f)
+    pages = []
+    for _ in range(n):
+        i, = struct.unpack("<q", f.read(8))
+        pages.append((i, _read_block(f)))
+
+    if flags & _PAGED:
+        mem = PagedMemory()
+        for i, page in pages:
+            mem.pages[i] = page
+    else:
+        mem = [0] * size
+        for i, page in pages:
+            start = i << PAGE_BITS
+            mem[start:start + len(page)] = page
+
+    vm = Program(mem, inp, max_out=max_out if max_out >= 0 else None)
+    vm.out.extend(out)
+    vm.pos = None if flags & _HALTED else pos
+    vm.rb = rb
+    if flags & _COMPILED and vm.pos is not None:
+        # Compiled code is correct for any memory, the program may have
+        # changed its data since it was first compiled
+        from .compiler import compile_program
+        vm._compiled = compile_program(mem if vm.memory == "list" else mem.tolist(), vm.memory)
+        vm.invalidate()
+    return vm
+
+
+def save(vm: Program, path: str) -> None:
+    """Write a checkpoint of vm to path"""
+    with open(path, "wb") as f:
+        _write(vm, f)
+
+
+def load(path: str) -> Program:
+    """A machine in the state saved to path"""
+    with open(path, "rb") as f:
+        return _read(f)
+
+
+def dumps(vm: Program) -> bytes:
+    f = io.BytesIO()
+    _write(vm, f)
+    return f.getvalue()
+
+
+def loads(data: bytes) -> Program:
+    return _read(io.BytesIO(data))
@@ -0,0 +1,362 @@
+"""
+Ahead of time compilation of Intcode images to Python.
+
+The image is split into basic blocks starting at 0, at jump targets, after
+conditional jumps and outputs, at reads and at constants the program
+computes from immediates (return addresses pushed before a call). Every block becomes a
+Python function running the block as straight line code and returning the
+next program counter, and a dispatch loop calls the block at that address.
+The cells after a jump that is always taken are data.
+
+Cells that instructions write to with a constant address are volatile. A
+volatile operand is read from memory when the instruction runs, and a
+block ends before an instruction whose opcode is volatile. Writes through
+the relative base into compiled code are checked at run time, and leave
+compiled code for good. Addresses without a block are run by the
+interpreter until it reaches one.
+
+Compiled code is cached on disk, keyed by a hash of the image, in
+$INTCODE_CACHE or ~/.cache/intcode. The least recently used entries are
+removed when they take more than MAX_CACHE_BYTES.
+"""
+from typing import Dict, List, Optional
+import hashlib
+import importlib.util
+import marshal
+import os
+
+from .disasm import decode
+from .memory import PAGE_BITS, PAGE_MASK
+from .program import OPS, _Blocked
+
+
+VERSION = 3
+
+CACHE_DIR = os.environ.get("INTCODE_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "intcode"))
+
+
+MAX_BLOCK = 64
+
+MAX_CACHE_BYTES = 64 << 20
+
+
+def _const(expr: str) -> Optional[int]:
+    """The value of expr if it is an integer literal"""
+    try:
+        return int(expr)
+    except ValueError:
+        return None
+
+
+def _fold(fmt, f, x, y) -> str:
+    """fmt.format(x, y), or the literal f(x, y) when x and y are literals"""
+    if _const(x) is not None and _const(y) is not None:
+        return str(f(_const(x), _const(y)))
+    return fmt.format(x, y)
+
+
+def _rel(arg) -> str:
+    return "rb + {}".format(arg) if arg != 0 else "rb"
+
+
+class _Modified(Exception):
+    """Raised by compiled code after it wrote into its own code"""
+
+
+class CompiledProgram:
+    def __init__(self, blocks, code, words):
+        self.blocks = blocks  # address -> block function
+        self.code = code  # compiled cells that must not change
+        self.words = words  # compiled cell -> the value it was compiled with
+
+    def run(self, vm, stop_on_output) -> bool:
+        """
+        Run compiled blocks from vm.pos until the program halts, or with
+        stop_on_output until there is output, and after vm._steps blocks
+        if it is set. Returns False if it stopped at an address without a
+        block or after the program modified its code. Raises _Blocked
+        when it needs input.
+        """
+        blocks = self.blocks
+        mem = vm.mem if vm.memory == "list" else vm.mem.pages
+        out = vm.out
+        pc, rb = vm.pos, vm.rb
+        steps = vm._steps
+        try:
+            if steps is None:
+                while pc is not None:
+                    f = blocks.get(pc)
+                    if f is None:
+                        return False
+                    pc, rb = f(vm, mem, rb)
+                    if stop_on_output and out:
+                        break
+            else:
+                while pc is not None and steps:
+                    f = blocks.get(pc)
+                    if f is None:
+                        return False
+                    pc, rb = f(vm, mem, rb)
+                    steps -= 1
+                    if stop_on_output and out:
+                        break
+        except _Modified as e:
+            pc, rb = e.args
+            return False
+        finally:
+            vm.pos, vm.rb = pc, rb
+            vm._steps = steps
+        return True
+
+
+def discover(image):
+    """Return (leaders, instructions) reachable from address 0"""
+    leaders = set()
+    instructions = {}
+    todo = [0]
+    while todo:
+        pos = todo.pop()
+        if pos in leaders:
+            continue
+        leaders.add(pos)
+        while pos not in instructions:
+            d = decode(image, pos)
+            if d is None:
+                break
+            instructions[pos] = d
+            opcode, modes, args = d
+            if opcode in (5, 6) and modes[1] == 1:
+                todo.append(args[1])
+            if opcode in (1, 2) and modes[0] == modes[1] == 1:
+                v = args[0] + args[1] if opcode == 1 else args[0] * args[1]
+                if 0 <= v < len(image):
+                    todo.append(v)
+            if opcode == 3:
+                leaders.add(pos)
+            if opcode == 4:
+                todo.append(pos + 2)
+            if opcode in (5, 6):
+                if modes[0] != 1 or (args[0] != 0) != (opcode == 5):
+                    todo.append(pos + 3)  # does not always jump
+                break
+            if opcode == 99:
+                break
+            pos += len(args) + 1
+    return leaders, instructions
+
+
+class _Gen:
+    """Python source for the blocks of one image and memory backend"""
+
+    def __init__(self, image, memory):
+        self.image = image
+        self.memory = memory
+        self.leaders, self.instructions = discover(image)
+        self.volatile = set()
+        for pos, (opcode, modes, args) in self.instructions.items():
+            body = OPS[opcode][2]
+            for i, m in enumerate(modes):
+                if m == 0 and "{{w{}}}".format(i + 1) in body:
+                    self.volatile.add(args[i])
+
+    def cell(self, addr: str) -> str:
+        if self.memory == "list":
+            return "(mem[{0}] if {0} < len(mem) else 0)".format(addr)
+        return "mem[({0}) >> {1}][({0}) & {2}]".format(addr, PAGE_BITS, PAGE_MASK)
+
+    def const_cell(self, addr: int) -> str:
+        if not 0 <= addr < len(self.image):
+            return self.cell(str(addr))
+        if self.memory == "list":
+            return "mem[{}]".format(addr)
+        return "mem[{}][{}]".format(addr >> PAGE_BITS, addr & PAGE_MASK)
+
+    def arg(self, pos, i, args) -> Optional[str]:
+        """The raw argument i, or None if it is a constant"""
+        if pos + 1 + i in self.volatile:
+            return self.const_cell(pos + 1 + i)
+        return None
+
+    def read(self, pos, i, modes, args) -> str:
+        raw = self.arg(pos, i, args)
+        if modes[i] == 1:
+            return raw or str(args[i])
+        if modes[i] == 2:
+            return self.cell(_rel(raw or args[i]))
+        if raw is None:
+            return self.const_cell(args[i])
+        return self.cell(raw)
+
+    def write(self, pos, i, modes, args, value, nxt) -> List[str]:
+        raw = self.arg(pos, i, args)
+        if modes[i] == 0 and raw is None:
+            # Paged memory may share the page with a fork
+            addr = args[i]
+            if 0 <= addr < len(self.image) and self.memory == "list":
+                return ["mem[{}] = {}".format(addr, value)]
+            return ["store({}, {})".format(addr, value)]
+
+        target = raw if modes[i] == 0 else _rel(raw or args[i])
+        lines = [
+            "v = {}".format(value),
+            "t = {}".format(target),
+            "if t in CODE:",
+            "    store(t, v)",
+            "    raise _Modified({}, rb)".format(nxt),
+        ]
+        if self.memory == "list":
+            lines += ["if 0 <= t < len(mem):", "    mem[t] = v", "else:", "    store(t, v)"]
+        else:
+            lines += ["store(t, v)"]
+        return lines
+
+    def block(self, start):
+        """
+        Source of the block function starting at start, and the cells it
+        compiled.
+
+        The block runs on through the fall through of conditional jumps and
+        into the targets of constant jumps, until an output, a read, a halt,
+        an address it already passed or MAX_BLOCK instructions.
+        """
+        lines = []
+        code = set()
+        seen = set()
+        pos = start
+        while True:
+            d = self.instructions.get(pos)
+            if (d is None or pos in self.volatile or pos in seen or len(seen) == MAX_BLOCK
+                    or (pos != start and d[0] == 3)):
+                lines.append("return {}, rb".format(pos))
+                break
+            seen.add(pos)
+            opcode, modes, args = d
+            name, size, _ = OPS[opcode]
+            nxt = pos + size
+            code.update(range(pos, nxt))
+            r = lambda i: self.read(pos, i, modes, args)
+            w = lambda i, value: self.write(pos, i, modes, args, value, nxt)
+
+            lines.append("# {}: {}".format(pos, " ".join([name] + [str(a) for a in args])))
+            if opcode == 1:
+                lines += w(2, _fold("{} + {}", lambda x, y: x + y, r(0), r(1)))
+            elif opcode == 2:
+                lines += w(2, _fold("{} * {}", lambda x, y: x * y, r(0), r(1)))
+            elif opcode == 3:
+                lines += ["inp = vm.inp", "if not inp:", "    raise _Blocked()"]
+                lines += w(0, "inp.popleft()")
+            elif opcode == 4:
+                lines += ["vm.out.append({})".format(r(0)), "return {}, rb".format(nxt)]
+                break
+            elif opcode in (5, 6):
+                cond = "{} != 0" if opcode == 5 else "{} == 0"
+                taken = _fold(cond, lambda x, _: int(x != 0 if opcode == 5 else x == 0), r(0), "0")
+                target = r(1)
+                if taken == "0":
+                    pos = nxt
+                    continue
+                if taken != "1":
+                    lines += ["if {}:".format(taken), "    return {}, rb".format(target)]
+                    pos = nxt
+                    continue
+                if _const(target) is None:
+                    lines.append("return {}, rb".format(target))
+                    break
+                pos = _const(target)
+                continue
+            elif opcode == 7:
+                lines += w(2, _fold("1 if {} < {} else 0", lambda x, y: int(x < y), r(0), r(1)))
+            elif opcode == 8:
+                lines += w(2, _fold("1 if {} == {} else 0", lambda x, y: int(x == y), r(0), r(1)))
+            elif opcode == 9:
+                lines.append("rb += {}".format(r(0)))
+            elif opcode == 99:
+                lines.append("return None, rb")
+                break
+            pos = nxt
+
+        src = ["def b_{}(vm, mem, rb):".format(start), "    store = vm.store"]
+        src += ["    " + l for l in lines]
+        return "\n".join(src), code
+
+    def source(self) -> str:
+        blocks = []
+        code = set()
+        for start in sorted(self.leaders):
+            if start in self.instructions and start not in self.volatile:
+                src, cells = self.block(start)
+                blocks.append((start, src))
+                code |= cells
+        code -= self.volatile
+
+        out = ["CODE = frozenset({})".format(sorted(code)), ""]
+        for _, src in blocks:
+            out += [src, ""]
+        out.append("BLOCKS = {{{}}}".format(", ".join("{0}: b_{0}".format(s) for s, _ in blocks)))
+        return "\n".join(out) + "\n"
+
+
+def source(image: List[int], memory="list") -> str:
+    """The generated Python source for image"""
+    return _Gen(image, memory).source()
+
+
+_compiled = {}  # type: Dict[str, CompiledProgram]
+
+
+def _key(image, memory) -> str:
+    s = "{} {} {}".format(VERSION, memory, ",".join(map(str, image)))
+    return hashlib.sha256(s.encode()).hexdigest()
+
+
+def evict(max_bytes=MAX_CACHE_BYTES) -> None:
+    """Remove the least recently used compiled code until it fits in max_bytes"""
+    entries = []
+    for e in os.scandir(CACHE_DIR):
+        if e.name.endswith(".bin"):
+            st = e.stat()
+            entries.append((st.st_mtime, st.st_size, e.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # removed by another process
+        total -= size
+
+
+def _load_code(key, image, memory):
+    path = os.path.join(CACHE_DIR, "{}-{}.bin".format(key, importlib.util.MAGIC_NUMBER.hex()))
+    try:
+        with open(path, "rb") as f:
+            code = marshal.load(f)
+        os.utime(path)  # most recently used
+        return code
+    except (OSError, EOFError, ValueError):
+        pass
+
+    code = compile(source(image, memory), "<intcode {}>".format(key[:12]), "exec")
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = "{}.{}".format(path, os.getpid())
+        with open(tmp, "wb") as f:
+            marshal.dump(code, f)
+        os.replace(tmp, path)
+        evict()
+    except OSError:
+        pass  # no cache, compile again next time
+    return code
+
+
+def compile_program(image: List[int], memory="list") -> CompiledProgram:
+    """Compile image for machines with the given memory backend"""
+    key = _key(image, memory)
+    if key not in _compiled:
+        env = {"_Blocked": _Blocked, "_Modified": _Modified}
+        exec(_load_code(key, image, memory), env)
+        # instructions running off the end of image read zeroes there
+        words = {a: image[a] if a < len(image) else 0 for a in env["CODE"]}
+        _compiled[key] = CompiledProgram(env["BLOCKS"], env["CODE"], words)
+    return _compiled[key]
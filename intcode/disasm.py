@@ -0,0 +1,223 @@
+"""
+Disassemble Intcode images and build their control flow graph.
+
+Instructions are found by following control flow from address 0, into
+the targets of immediate jumps and into constants the program pushes
+through the relative base, which is how it pushes return addresses.
+Everything else is data. The reachable instructions are split into basic
+blocks, which end at jumps and halts. Jumps to a computed address, like
+returns, have no known successors and are marked indirect.
+
+Cells that instructions write with a constant address and that hold
+code are self-modified. Writes through the relative base can reach any
+cell and are only listed.
+
+    python -m intcode.disasm [--dot] [path]
+
+prints the listing, or a Graphviz graph, of the image in path.
+"""
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple
+import argparse
+
+from .program import OPS, load_program
+
+
+Instruction = namedtuple("Instruction", "pos opcode op modes args")
+
+
+def decode(image, pos):
+    """(opcode, modes, args) of the instruction at pos, or None if it is not one"""
+    if not 0 <= pos < len(image):
+        return None
+    ins = image[pos]
+    opcode = ins % 100
+    if ins < 0 or opcode not in OPS:
+        return None
+    _, size, body = OPS[opcode]
+    modes = [ins // 100 % 10, ins // 1000 % 10, ins // 10000 % 10][:size - 1]
+    for i, m in enumerate(modes):
+        if m > 2 or (m == 1 and "{{w{}}}".format(i + 1) in body):
+            return None
+    args = image[pos + 1:pos + size]
+    args += [0] * (size - 1 - len(args))
+    return opcode, modes, args
+
+
+def is_write(opcode, i) -> bool:
+    """True if argument i of opcode is written to"""
+    return "{{w{}}}".format(i + 1) in OPS[opcode][2]
+
+
+def _arg(mode, a) -> str:
+    if mode == 0:
+        return "[{}]".format(a)
+    if mode == 2:
+        return "[rb{:+d}]".format(a)
+    return str(a)
+
+
+class Block:
+    def __init__(self, start: int):
+        self.start = start
+        self.instructions = []  # type: List[Instruction]
+        self.succ = []  # type: List[int]
+        self.indirect = False  # ends with a jump to a computed address
+
+    @property
+    def end(self) -> int:
+        """The address after the block"""
+        last = self.instructions[-1]
+        return last.pos + len(last.args) + 1
+
+    def __repr__(self):
+        return "Block({}..{} -> {})".format(self.start, self.end, self.succ)
+
+
+class Disassembly:
+    """
+    instructions maps addresses to the reachable instructions, blocks maps
+    the first address of every basic block to it. modified holds the
+    (start, end) ranges of self-modified code, relative_writes the
+    addresses of instructions writing through the relative base and data
+    the ranges of cells that are not reachable code.
+    """
+
+    def __init__(self, image: List[int]):
+        self.image = image
+        self.instructions = {}  # type: Dict[int, Instruction]
+        self.targets = set()  # addresses the program jumps to or computes
+        self._walk()
+        self.blocks = self._split()
+        self.code = {a for ins in self.instructions.values() for a in range(ins.pos, ins.pos + len(ins.args) + 1)}
+        self.writes = {}  # type: Dict[int, List[int]]
+        self.relative_writes = []  # type: List[int]
+        for ins in self.instructions.values():
+            for i, m in enumerate(ins.modes):
+                if is_write(ins.opcode, i):
+                    if m == 0:
+                        self.writes.setdefault(ins.args[i], []).append(ins.pos)
+                    else:
+                        self.relative_writes.append(ins.pos)
+        self.modified = _ranges(a for a in self.writes if a in self.code)
+        self.data = _ranges(a for a in range(len(image)) if a not in self.code)
+
+    def _walk(self) -> None:
+        todo = [0]
+        while todo:
+            pos = todo.pop()
+            while pos not in self.instructions:
+                d = decode(self.image, pos)
+                if d is None:
+                    break
+                opcode, modes, args = d
+                self.instructions[pos] = Instruction(pos, opcode, OPS[opcode][0], modes, args)
+                if opcode in (5, 6) and modes[1] == 1:
+                    self.targets.add(args[1])
+                    todo.append(args[1])
+                if opcode in (1, 2) and modes == [1, 1, 2]:
+                    # pushes a constant, a return address if it is code
+                    v = args[0] + args[1] if opcode == 1 else args[0] * args[1]
+                    if decode(self.image, v) is not None:
+                        self.targets.add(v)
+                        todo.append(v)
+                if opcode == 99:
+                    break
+                pos += len(args) + 1
+
+    def _split(self) -> Dict[int, Block]:
+        leaders = {0} | self.targets
+        for ins in self.instructions.values():
+            if ins.opcode in (5, 6, 99):
+                leaders.add(ins.pos + len(ins.args) + 1)
+
+        blocks = {}
+        block = None  # type: Optional[Block]
+        for pos in sorted(self.instructions):
+            ins = self.instructions[pos]
+            if block is None or pos in leaders or pos != block.end:
+                if block is not None and pos == block.end and not block.succ:
+                    block.succ.append(pos)  # falls through
+                block = blocks[pos] = Block(pos)
+            block.instructions.append(ins)
+            if ins.opcode in (5, 6):
+                cond, target = ins.args
+                const = ins.modes[0] == 1
+                taken = (cond != 0) == (ins.opcode == 5)
+                if ins.modes[1] != 1:
+                    block.indirect = True
+                elif not const or taken:
+                    block.succ.append(target)
+                if not const or not taken:
+                    block.succ.append(block.end)
+                block = None
+            elif ins.opcode == 99:
+                block = None
+        return blocks
+
+    def block_at(self, pos: int) -> Optional[Block]:
+        """The block holding the instruction at pos"""
+        for b in self.blocks.values():
+            if b.start <= pos < b.end:
+                return b
+        return None
+
+    def format(self) -> str:
+        """The listing, one line per instruction. Self-modified cells are marked with *"""
+        written = {a for a in self.writes if a in self.code}
+        lines = []
+        for start in sorted(self.blocks):
+            b = self.blocks[start]
+            succ = [str(s) for s in b.succ] + (["indirect"] if b.indirect else [])
+            if not succ:
+                succ = ["halt" if b.instructions[-1].opcode == 99 else "end"]
+            lines.append("block {} -> {}".format(start, ", ".join(succ)))
+            for ins in b.instructions:
+                mark = "*" if any(a in written for a in range(ins.pos, ins.pos + len(ins.args) + 1)) else " "
+                args = " ".join(_arg(m, a) for m, a in zip(ins.modes, ins.args))
+                lines.append("{} {:5}: {} {}".format(mark, ins.pos, ins.op, args).rstrip())
+        for start, end in self.data:
+            lines.append("data {}..{}".format(start, end))
+        return "\n".join(lines) + "\n"
+
+    def dot(self) -> str:
+        """The control flow graph in Graphviz format"""
+        lines = ["digraph intcode {", "  node [shape=box fontname=monospace];"]
+        for start in sorted(self.blocks):
+            b = self.blocks[start]
+            label = "\\l".join("{}: {} {}".format(i.pos, i.op, " ".join(_arg(m, a) for m, a in zip(i.modes, i.args)))
+                               for i in b.instructions)
+            style = " style=dashed" if b.indirect else ""
+            lines.append('  b{} [label="{}\\l"{}];'.format(start, label, style))
+            for s in b.succ:
+                lines.append("  b{} -> b{};".format(start, s))
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+
+def _ranges(addrs) -> List[Tuple[int, int]]:
+    """Sorted addresses as (start, end) ranges of consecutive addresses"""
+    ranges = []
+    for a in sorted(addrs):
+        if ranges and ranges[-1][1] == a:
+            ranges[-1] = (ranges[-1][0], a + 1)
+        else:
+            ranges.append((a, a + 1))
+    return ranges
+
+
+def disassemble(image: List[int]) -> Disassembly:
+    return Disassembly(image)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Disassemble an Intcode image")
+    parser.add_argument("path", nargs="?", default="input")
+    parser.add_argument("--dot", action="store_true", help="print the control flow graph for Graphviz")
+    args = parser.parse_args(argv)
+    d = disassemble(load_program(args.path))
+    print(d.dot() if args.dot else d.format(), end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+A dense 2D grid of small values that grows in every direction.
+
+Cells are bytes in one bytearray, row after row, and the origin sits at an
+offset into it, so any coordinates can be used. Setting a cell outside
+the grid at least doubles it in that direction and moves the offset, so
+a walk of n steps copies O(n) cells in total. A second bytearray marks
+the cells that were ever set, and their count and bounds are kept up to
+date as they are set. intcode.render draws grids.
+"""
+from typing import Iterator, Optional, Tuple
+
+
+class Grid:
+    """
+    Cells that were never set hold default. len(), in, get() and items()
+    only see the cells that were set, like a dict keyed by (x, y).
+    """
+
+    def __init__(self, default=0, width=16, height=16):
+        self.default = default
+        self.width = width
+        self.height = height
+        self.x0 = width // 2  # column of x == 0
+        self.y0 = height // 2  # row of y == 0
+        self.cells = bytearray([default]) * (width * height)
+        self.painted = bytearray(width * height)
+        self.count = 0
+        self.bounds = None  # type: Optional[Tuple[int, int, int, int]]
+
+    def _index(self, x: int, y: int) -> Optional[int]:
+        col, row = x + self.x0, y + self.y0
+        if 0 <= col < self.width and 0 <= row < self.height:
+            return row * self.width + col
+        return None
+
+    def _grow(self, x: int, y: int) -> None:
+        col, row = x + self.x0, y + self.y0
+        w, h = self.width, self.height
+        left = max(-col, w) if col < 0 else 0
+        right = max(col - w + 1, w) if col >= w else 0
+        top = max(-row, h) if row < 0 else 0
+        bottom = max(row - h + 1, h) if row >= h else 0
+        nw, nh = w + left + right, h + top + bottom
+        cells = bytearray([self.default]) * (nw * nh)
+        painted = bytearray(nw * nh)
+        for r in range(h):
+            i = (r + top) * nw + left
+            cells[i:i + w] = self.cells[r * w:(r + 1) * w]
+            painted[i:i + w] = self.painted[r * w:(r + 1) * w]
+        self.cells, self.painted = cells, painted
+        self.width, self.height = nw, nh
+        self.x0 += left
+        self.y0 += top
+
+    def __getitem__(self, pos: Tuple[int, int]) -> int:
+        i = self._index(*pos)
+        return self.default if i is None else self.cells[i]
+
+    def __setitem__(self, pos: Tuple[int, int], value: int) -> None:
+        x, y = pos
+        col, row = x + self.x0, y + self.y0
+        if not (0 <= col < self.width and 0 <= row < self.height):
+            self._grow(x, y)
+            col, row = x + self.x0, y + self.y0
+        i = row * self.width + col
+        self.cells[i] = value
+        if not self.painted[i]:
+            self.painted[i] = 1
+            self.count += 1
+            b = self.bounds
+            if b is None:
+                self.bounds = x, y, x, y
+            elif not (b[0] <= x <= b[2] and b[1] <= y <= b[3]):
+                self.bounds = min(b[0], x), min(b[1], y), max(b[2], x), max(b[3], y)
+
+    def __contains__(self, pos: Tuple[int, int]) -> bool:
+        i = self._index(*pos)
+        return i is not None and self.painted[i] == 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def get(self, pos: Tuple[int, int], default=None) -> Optional[int]:
+        x, y = pos
+        col, row = x + self.x0, y + self.y0
+        if 0 <= col < self.width and 0 <= row < self.height:
+            i = row * self.width + col
+            if self.painted[i]:
+                return self.cells[i]
+        return default
+
+    def items(self) -> Iterator[Tuple[Tuple[int, int], int]]:
+        """((x, y), value) of the cells that were set, row by row"""
+        i = self.painted.find(1)
+        while i >= 0:
+            row, col = divmod(i, self.width)
+            yield (col - self.x0, row - self.y0), self.cells[i]
+            i = self.painted.find(1, i + 1)
+
+    def raster(self) -> Tuple[bytes, int, int]:
+        """(cells, width, height) of the cells within the bounds, row by row"""
+        if self.bounds is None:
+            return b"", 0, 0
+        minx, miny, maxx, maxy = self.bounds
+        width = maxx - minx + 1
+        start = (miny + self.y0) * self.width + minx + self.x0
+        cells = b"".join(self.cells[i:i + width]
+                         for i in range(start, start + (maxy - miny + 1) * self.width, self.width))
+        return cells, width, maxy - miny + 1
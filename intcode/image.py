@@ -0,0 +1,99 @@
+"""
+Binary images of Intcode programs, so that loading a program does not
+parse its text every time.
+
+The first load of a text file writes its image to the cache directory,
+$INTCODE_CACHE/images or ~/.cache/intcode/images. The image holds every
+cell as a little endian int64, and loading it is a single read into an
+array. Cells that do not fit in 64 bits hold ESCAPE in the array, and
+their values are kept as text after it. The image records the size and
+modification time of the text file, and is written again when they
+change. INTCODE_NO_CACHE=1 always parses the text.
+"""
+from array import array
+from typing import List, Optional
+import hashlib
+import os
+import struct
+
+from . import compiler
+
+
+MAGIC = b"ICIM"
+VERSION = 1
+ESCAPE = -(1 << 63)
+
+# version, source size, source mtime in ns, number of cells, number of escapes
+_HEADER = struct.Struct("<BqqqI")
+
+
+def parse(text: str) -> List[int]:
+    return [int(n) for n in text.split(",")]
+
+
+def _path(source: str) -> str:
+    name = hashlib.sha256(os.path.abspath(source).encode()).hexdigest()
+    return os.path.join(compiler.CACHE_DIR, "images", name + ".img")
+
+
+def encode(mem: List[int], size=0, mtime=0) -> bytes:
+    cells = array("q")
+    escapes = []
+    for i, v in enumerate(mem):
+        if ESCAPE < v < 1 << 63:
+            cells.append(v)
+        else:
+            cells.append(ESCAPE)
+            escapes.append("{}:{}".format(i, v))
+    tail = ",".join(escapes).encode()
+    return MAGIC + _HEADER.pack(VERSION, size, mtime, len(cells), len(escapes)) + cells.tobytes() + tail
+
+
+def decode(data: bytes, size=None, mtime=None) -> Optional[List[int]]:
+    """The cells of an image, or None if it is not one of a source with this size and mtime"""
+    if data[:len(MAGIC)] != MAGIC or len(data) < len(MAGIC) + _HEADER.size:
+        return None
+    version, src_size, src_mtime, n, n_escapes = _HEADER.unpack_from(data, len(MAGIC))
+    if version != VERSION or (size is not None and (src_size, src_mtime) != (size, mtime)):
+        return None
+    start = len(MAGIC) + _HEADER.size
+    end = start + 8 * n
+    if len(data) < end:
+        return None
+    cells = array("q")
+    cells.frombytes(data[start:end])
+    mem = cells.tolist()
+    if n_escapes:
+        for e in data[end:].decode().split(","):
+            i, v = e.split(":")
+            mem[int(i)] = int(v)
+    return mem
+
+
+def load(source: str) -> List[int]:
+    """The program in the text file source, from its binary image when it is current"""
+    if os.environ.get("INTCODE_NO_CACHE", "") not in ("", "0"):
+        with open(source) as f:
+            return parse(f.read())
+
+    st = os.stat(source)
+    path = _path(source)
+    try:
+        with open(path, "rb") as f:
+            mem = decode(f.read(), st.st_size, st.st_mtime_ns)
+        if mem is not None:
+            return mem
+    except OSError:
+        pass
+
+    with open(source) as f:
+        mem = parse(f.read())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = "{}.{}".format(path, os.getpid())
+        with open(tmp, "wb") as f:
+            f.write(encode(mem, st.st_size, st.st_mtime_ns))
+        os.replace(tmp, path)
+    except OSError:
+        pass  # no cache, parse again next time
+    return mem
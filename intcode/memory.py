@@ -0,0 +1,65 @@
+from typing import List, Optional
+
+PAGE_BITS = 12
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+
+
+class _Pages(dict):
+    """page number -> page. Missing pages read as a shared page of zeroes."""
+
+    ZERO = (0,) * PAGE_SIZE
+
+    def __missing__(self, key):
+        return self.ZERO
+
+
+class PagedMemory:
+    """
+    Sparse Intcode memory split into pages of PAGE_SIZE cells.
+
+    Pages are allocated on the first write into them, so a program writing
+    to address 10**9 only costs one page. Cells never written read as 0,
+    like the uninitialized memory of a list backed program. Reads of
+    missing pages never allocate.
+
+    copy() shares all pages between the two memories, and each of them
+    copies a shared page the first time it writes to it.
+    """
+
+    def __init__(self, values=()):
+        self.pages = _Pages()
+        self.shared = set()  # numbers of pages that must be copied before writing
+        values = list(values)
+        for start in range(0, len(values), PAGE_SIZE):
+            page = values[start:start + PAGE_SIZE]
+            page.extend(0 for _ in range(PAGE_SIZE - len(page)))
+            self.pages[start >> PAGE_BITS] = page
+
+    def __getitem__(self, addr: int) -> int:
+        return self.pages[addr >> PAGE_BITS][addr & PAGE_MASK]
+
+    def __setitem__(self, addr: int, value: int) -> None:
+        i = addr >> PAGE_BITS
+        page = self.pages.get(i)
+        if page is None:
+            page = self.pages[i] = [0] * PAGE_SIZE
+        elif i in self.shared:
+            page = self.pages[i] = page[:]
+            self.shared.discard(i)
+        page[addr & PAGE_MASK] = value
+
+    def copy(self) -> "PagedMemory":
+        m = PagedMemory()
+        m.pages.update(self.pages)
+        self.shared = set(self.pages)
+        m.shared = set(self.pages)
+        return m
+
+    def tolist(self, n: Optional[int] = None) -> List[int]:
+        """The first n cells as a list, by default up to the first missing page"""
+        if n is None:
+            n = 0
+            while n >> PAGE_BITS in self.pages:
+                n += PAGE_SIZE
+        return [self[i] for i in range(n)]
@@ -0,0 +1,150 @@
+"""
+Networks of Intcode machines connected by channels, run with asyncio.
+
+Every machine runs as a task that reads from one input channel and
+writes its output to any number of channels, so machines can be chained,
+connected in rings, or fan out to several readers, and several machines
+can write into one channel. A machine's task only resumes when its
+channel has values, idle machines cost nothing.
+
+    net = Network()
+    a, b = net.add(Program(image)), net.add(Program(image))
+    net.ring([a, b])
+    out = net.sink(b)
+    a.send([0])
+    net.run()
+
+run() returns when every machine has halted or is waiting for input with
+nothing queued, so a network can be fed and run again.
+"""
+from collections import deque
+from typing import Iterable, List, Optional
+import asyncio
+
+from .program import Program
+
+
+class Channel:
+    """Values sent to a machine, or collected from one by a sink"""
+
+    def __init__(self, net: Optional["Network"] = None):
+        self.values = deque()
+        self._net = net
+        self._waiter = None
+
+    def put(self, values: Iterable[int]) -> None:
+        self.values.extend(values)
+        w = self._waiter
+        if w is not None and self.values:
+            self._waiter = None
+            self._net._idle -= 1
+            w.set_result(None)
+
+    async def get(self) -> List[int]:
+        """Wait until there are values, then remove and return all of them"""
+        if not self.values:
+            self._waiter = asyncio.get_running_loop().create_future()
+            self._net._idle += 1
+            self._net._check()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        values = list(self.values)
+        self.values.clear()
+        return values
+
+
+class Node:
+    """A machine in a network, with its input channel and output channels"""
+
+    def __init__(self, net: "Network", program: Program, name):
+        self.program = program
+        self.name = name
+        self.inbox = Channel(net)
+        self.outputs = []  # type: List[Channel]
+
+    def send(self, values: Iterable[int]) -> None:
+        """Queue input for the machine"""
+        self.inbox.put(values)
+
+    def __repr__(self):
+        return "Node({!r})".format(self.name)
+
+
+class Network:
+    def __init__(self):
+        self.nodes = []  # type: List[Node]
+        self._live = 0
+        self._idle = 0
+        self._done = None
+
+    def add(self, program: Program, inp: Iterable[int] = (), name=None) -> Node:
+        """Add a machine, with initial input, named by its index unless name is given"""
+        node = Node(self, program, len(self.nodes) if name is None else name)
+        node.send(inp)
+        self.nodes.append(node)
+        return node
+
+    def connect(self, src: Node, dst: Node) -> None:
+        """Send the output of src to dst, in addition to its other outputs"""
+        src.outputs.append(dst.inbox)
+
+    def chain(self, nodes: List[Node]) -> None:
+        for a, b in zip(nodes, nodes[1:]):
+            self.connect(a, b)
+
+    def ring(self, nodes: List[Node]) -> None:
+        self.chain(nodes)
+        self.connect(nodes[-1], nodes[0])
+
+    def sink(self, node: Node) -> Channel:
+        """A channel collecting the output of node in its values"""
+        ch = Channel()
+        node.outputs.append(ch)
+        return ch
+
+    def _check(self) -> None:
+        """Stop the run when no machine can make progress"""
+        if self._idle == self._live and not self._done.done():
+            self._done.set_result(None)
+
+    async def _machine(self, node: Node) -> None:
+        p = node.program
+        try:
+            while True:
+                p.run_until_input()
+                out = p.drain()
+                if out:
+                    for ch in node.outputs:
+                        ch.put(out)
+                if p.is_done():
+                    break
+                p.feed(await node.inbox.get())
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            if not self._done.done():
+                self._done.set_exception(e)
+            return
+        self._live -= 1
+        self._check()
+
+    async def run_async(self) -> None:
+        """Run the machines until all of them have halted or wait for input"""
+        self._done = asyncio.get_running_loop().create_future()
+        nodes = [n for n in self.nodes if not n.program.is_done()]
+        self._live = len(nodes)
+        self._idle = 0
+        if not nodes:
+            return
+        tasks = [asyncio.ensure_future(self._machine(n)) for n in nodes]
+        try:
+            await self._done
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run(self) -> None:
+        asyncio.run(self.run_async())
@@ -0,0 +1,188 @@
+"""
+Run chains of Intcode machines in separate processes.
+
+Every machine runs in its own worker process, and reads its input from a
+ring buffer in shared memory that the previous machine writes to, so
+compute heavy stages run on separate cores. A worker collects the output
+of its machine and moves it to the next ring in batches, and only sends
+a value on by itself when the next machine has nothing else to do, so
+processes synchronize about once per batch of values, not per value.
+With feedback the last machine writes to the ring of the first.
+
+    last = run(image, [[9], [8], [7], [6], [5]], first=[0], feedback=True)
+
+Values must fit in 64 bits. Starting processes takes milliseconds, so
+this only pays off for machines that run a long time.
+"""
+from multiprocessing import connection, shared_memory
+from typing import Iterable, List, Optional, Sequence
+import multiprocessing
+import os
+
+from .program import Program
+
+
+_HEAD, _TAIL, _CLOSED, _DATA = 0, 1, 2, 3  # header slots of a ring
+_LIMIT = 1 << 63
+_POLL = 0.1  # seconds between checks that the workers are alive
+
+
+class Ring:
+    """
+    A queue of int64 values in shared memory, for one writer and one
+    reader process. The writer waits while it is full and the reader
+    while it is empty, on semaphores the other side releases after each
+    batch.
+    """
+
+    def __init__(self, capacity=1 << 14):
+        self.capacity = capacity
+        self._shm = shared_memory.SharedMemory(create=True, size=8 * (_DATA + capacity))
+        self._owner = os.getpid()  # forked workers share this object, but must not free it
+        self._cells = self._shm.buf.cast("q")
+        self._cells[_HEAD] = self._cells[_TAIL] = self._cells[_CLOSED] = 0
+        self._filled = multiprocessing.Semaphore(0)
+        self._freed = multiprocessing.Semaphore(0)
+
+    def __getstate__(self):
+        return self.capacity, self._shm.name, self._filled, self._freed
+
+    def __setstate__(self, state):
+        self.capacity, name, self._filled, self._freed = state
+        self._shm = shared_memory.SharedMemory(name=name)
+        self._owner = None
+        self._cells = self._shm.buf.cast("q")
+
+    def put(self, values: Sequence[int]) -> None:
+        """Append values, waiting for the reader while the ring is full"""
+        cells, cap = self._cells, self.capacity
+        i = 0
+        while i < len(values):
+            tail = cells[_TAIL]
+            n = min(len(values) - i, cap - (tail - cells[_HEAD]))
+            if n == 0:
+                self._freed.acquire()
+                continue
+            for v in values[i:i + n]:
+                assert -_LIMIT <= v < _LIMIT, "value does not fit in 64 bits: {}".format(v)
+                cells[_DATA + tail % cap] = v
+                tail += 1
+            cells[_TAIL] = tail
+            i += n
+            self._filled.release()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[List[int]]:
+        """
+        Remove and return all values, waiting while there are none. Returns
+        an empty list once the ring is closed and empty, and None if
+        nothing came within timeout seconds.
+        """
+        cells, cap = self._cells, self.capacity
+        while True:
+            head, tail = cells[_HEAD], cells[_TAIL]
+            if head != tail:
+                break
+            if cells[_CLOSED]:
+                return []
+            if not self._filled.acquire(timeout=timeout):
+                return None
+        values = [cells[_DATA + i % cap] for i in range(head, tail)]
+        cells[_HEAD] = tail
+        self._freed.release()
+        return values
+
+    def __len__(self) -> int:
+        return self._cells[_TAIL] - self._cells[_HEAD]
+
+    def close(self) -> None:
+        """Tell the reader no more values will come"""
+        self._cells[_CLOSED] = 1
+        self._filled.release()
+
+    def release(self) -> None:
+        """Unmap the shared memory, and free it in the process that made it"""
+        self._cells.release()
+        self._shm.close()
+        if self._owner == os.getpid():
+            self._shm.unlink()
+
+
+def _worker(image: List[int], inp: List[int], src: Ring, dst: Ring, compiled: bool, batch: int) -> None:
+    p = Program(image, inp, compiled=compiled)
+    try:
+        while True:
+            out = []
+            for v in p.outputs():
+                out.append(v)
+                if len(out) >= batch or not len(dst):
+                    dst.put(out)  # the next machine has nothing to do
+                    out = []
+            if out:
+                dst.put(out)
+            if p.is_done():
+                break
+            values = src.get()
+            if not values:
+                break  # the machine before it stopped
+            p.feed(values)
+    finally:
+        dst.close()
+        src.release()
+        dst.release()
+
+
+def run(image: List[int], inputs: Sequence[Iterable[int]], first: Iterable[int] = (), *,
+        feedback=False, compiled=True, capacity=1 << 14, batch=256) -> List[int]:
+    """
+    Run one machine on a copy of image for every entry of inputs, each in
+    its own process, with machine i reading inputs[i] and then the output
+    of machine i - 1. The first machine reads first after its inputs.
+    A machine stops when it halts, or when it needs input and the machine
+    before it has stopped. Returns the output of the last machine no
+    machine read: all of it, or with feedback what the first machine left.
+
+    Output is sent on as soon as the next machine runs out of input, and
+    otherwise in batches of up to batch values. Raises AssertionError if
+    a worker fails, even one killed before it could close its ring.
+    """
+    n = len(inputs)
+    rings = [Ring(capacity) for _ in range(n + (not feedback))]
+    procs = []
+
+    def check():
+        for proc in procs:
+            assert proc.exitcode in (None, 0), "worker failed with exit code {}".format(proc.exitcode)
+
+    try:
+        if not feedback:
+            rings[0].close()
+        for i, inp in enumerate(inputs):
+            inp = list(inp) + list(first) if i == 0 else list(inp)  # not put in a ring, which may be too small
+            dst = rings[(i + 1) % len(rings)]
+            proc = multiprocessing.Process(target=_worker, args=(image, inp, rings[i], dst, compiled, batch))
+            proc.start()
+            procs.append(proc)
+        last = rings[0] if feedback else rings[-1]
+        result = []
+        while not feedback:
+            values = last.get(_POLL)
+            if values is None:
+                check()  # nothing came yet, or its writer died
+                continue
+            if not values:
+                break
+            result += values
+        pending = {proc.sentinel: proc for proc in procs}
+        while pending:
+            for sentinel in connection.wait(list(pending)):
+                pending.pop(sentinel).join()
+                check()
+        if feedback:
+            result = last.get()
+        return result
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+        for r in rings:
+            r.release()
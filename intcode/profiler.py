@@ -0,0 +1,99 @@
+"""
+Profile Intcode programs: attach a Profiler as Program(..., tracer=p).
+
+It counts instructions retired, executions per opcode and per program
+counter, and reads and writes per memory address, and can abort programs
+that run more instructions than a budget. Like every tracer it makes the
+machine use the interpreter, machines without it are not slowed down.
+"""
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import json
+
+from .program import OPS
+from .trace import Tracer
+
+
+class BudgetExceeded(Exception):
+    """Raised before the first instruction over a Profiler's budget"""
+
+
+class Profiler(Tracer):
+    """
+    Counts in retired, opcodes, pcs, reads and writes. With budget, raises
+    BudgetExceeded instead of running more than budget instructions. The
+    machine is left at the instruction it did not run, and can go on after
+    raising the budget.
+    """
+
+    def __init__(self, budget: Optional[int] = None):
+        super().__init__()
+        self.budget = budget
+        self.retired = 0
+        self.opcodes = Counter()  # opcode -> count
+        self.pcs = Counter()  # address -> count
+        self.reads = Counter()  # address -> count
+        self.writes = Counter()  # address -> count
+        self._op_at = {}  # address -> opcode last run there
+        self._access = {}  # instruction word -> ((arg index, mode, is write), ...)
+
+    def _memory_args(self, h) -> Tuple[Tuple[int, int, bool], ...]:
+        body = OPS[h.opcode][2]
+        modes = (h.ins // 100 % 10, h.ins // 1000 % 10, h.ins // 10000 % 10)
+        acc = tuple((i, modes[i], "{{w{}}}".format(i + 1) in body)
+                    for i in range(h.size - 1) if modes[i] != 1)
+        self._access[h.ins] = acc
+        return acc
+
+    def __call__(self, vm, pos, h, a, b, c):
+        if h.opcode == 3 and not vm.inp:
+            return  # blocks, and is traced again when it runs
+        if self.budget is not None and self.retired >= self.budget:
+            raise BudgetExceeded("instruction budget of {} exceeded at {}".format(self.budget, pos))
+        self.retired += 1
+        self.opcodes[h.opcode] += 1
+        self.pcs[pos] += 1
+        self._op_at[pos] = h.opcode
+        acc = self._access.get(h.ins)
+        if acc is None:
+            acc = self._memory_args(h)
+        args = (a, b, c)
+        for i, mode, write in acc:
+            addr = args[i] if mode == 0 else vm.rb + args[i]
+            if write:
+                self.writes[addr] += 1
+            else:
+                self.reads[addr] += 1
+        if self.callbacks:
+            super().__call__(vm, pos, h, a, b, c)
+
+    def hot(self, n=10) -> List[Tuple[int, int]]:
+        """The n most executed (address, count)"""
+        return self.pcs.most_common(n)
+
+    def to_dict(self) -> Dict:
+        return {
+            "retired": self.retired,
+            "opcodes": {OPS[op][0]: n for op, n in self.opcodes.most_common()},
+            "pcs": {str(pc): n for pc, n in sorted(self.pcs.items())},
+            "reads": {str(addr): n for addr, n in sorted(self.reads.items())},
+            "writes": {str(addr): n for addr, n in sorted(self.writes.items())},
+        }
+
+    def save_json(self, path) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def folded(self) -> str:
+        """
+        Counts in the folded stack format of flamegraph.pl and speedscope,
+        one "opcode;address count" line per address
+        """
+        lines = []
+        for pc, n in sorted(self.pcs.items()):
+            lines.append("{};{} {}".format(OPS[self._op_at[pc]][0], pc, n))
+        return "\n".join(lines) + "\n"
+
+    def save_folded(self, path) -> None:
+        with open(path, "w") as f:
+            f.write(self.folded())
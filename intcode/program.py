@@ -0,0 +1,662 @@
+from collections import deque, namedtuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .memory import PAGE_BITS, PAGE_MASK, PagedMemory
+
+
+def load_program(path="input") -> List[int]:
+    """The program in the text file path, loaded from its cached binary image, see intcode.image"""
+    from .image import load
+    return load(path)
+
+
+# State of a machine. mem is only shared with other snapshots and machines
+# copy-on-write.
+Snapshot = namedtuple("Snapshot", "mem pos rb inp out")
+
+
+class _Blocked(Exception):
+    """Raised by the read instruction when there is no input queued"""
+
+
+# opcode: (name, size, body)
+#
+# Bodies are templates where {r1}/{r2} are replaced by an expression reading
+# the parameter in its mode and {w1}/{w3} by the address to write to. Every
+# body returns the next program counter, or None to halt. n is the address
+# of the following instruction.
+OPS = {
+    1: ("add", 4, "vm.store({w3}, {r1} + {r2})\n    return n"),
+    2: ("mul", 4, "vm.store({w3}, {r1} * {r2})\n    return n"),
+    3: ("in", 2, "if not vm.inp:\n        raise _Blocked()\n    vm.store({w1}, vm.inp.popleft())\n    return n"),
+    4: ("out", 2, "vm.out.append({r1})\n    return n"),
+    5: ("jt", 3, "return {r2} if {r1} != 0 else n"),
+    6: ("jf", 3, "return {r2} if {r1} == 0 else n"),
+    7: ("lt", 4, "vm.store({w3}, 1 if {r1} < {r2} else 0)\n    return n"),
+    8: ("eq", 4, "vm.store({w3}, 1 if {r1} == {r2} else 0)\n    return n"),
+    9: ("arb", 2, "vm.rb += {r1}\n    return n"),
+    99: ("halt", 1, "return None"),
+}
+
+# memory backend: (handler prelude, expression loading the cell at {0})
+#
+# A list grows when written past its end, so reads past it return 0. Paged
+# memory is read straight from its pages, missing pages read as zeroes.
+MEMORY = {
+    "list": ("mem = vm.mem", "(mem[{0}] if {0} < len(mem) else 0)"),
+    "paged": ("mem = vm.mem.pages", "mem[({{0}}) >> {}][({{0}}) & {}]".format(PAGE_BITS, PAGE_MASK)),
+}
+
+_WRITE = {
+    0: "{0}",
+    2: "vm.rb + {0}",
+}
+
+# Markers in Program._cells
+_COMPILED = -1  # compiled code
+_WATCHED = -2  # writes are watched
+
+_handlers = {}  # type: Dict[Tuple[str, int], Tuple[object, int]]
+
+
+def _param(table, kind, mode, arg):
+    assert mode in table, "illegal {} mode: {}".format(kind, mode)
+    return table[mode].format(arg)
+
+
+def _valid(ins: int) -> bool:
+    """True if ins is an instruction word with legal modes"""
+    opcode = ins % 100
+    if ins < 0 or opcode not in OPS:
+        return False
+    _, size, body = OPS[opcode]
+    modes = [ins // 100 % 10, ins // 1000 % 10, ins // 10000 % 10]
+    for i in range(size - 1):
+        if modes[i] > 2 or (modes[i] == 1 and "{{w{}}}".format(i + 1) in body):
+            return False
+    return True
+
+
+def _body(ins, memory, args, body=None, params=None) -> str:
+    """The body of OPS for ins, or body, with its parameters read from args"""
+    opcode = ins % 100
+    assert opcode in OPS, "illegal opcode: {}".format(opcode)
+    _, size, default = OPS[opcode]
+    body = body or default
+    modes = [ins // 100 % 10, ins // 1000 % 10, ins // 10000 % 10]
+
+    _, load = MEMORY[memory]
+    read = {
+        0: load.format("{0}"),
+        1: "{0}",
+        2: load.format("vm.rb + {0}"),
+    }
+
+    params = dict(params or {})
+    for i in range(size - 1):
+        if "{{r{}}}".format(i + 1) in body and "r{}".format(i + 1) not in params:
+            params["r{}".format(i + 1)] = _param(read, "read", modes[i], args[i])
+        if "{{w{}}}".format(i + 1) in body:
+            params["w{}".format(i + 1)] = _param(_WRITE, "write", modes[i], args[i])
+    return body.format(**params)
+
+
+def handler(ins: int, memory="list"):
+    """
+    Return (function, size) executing the instruction word ins, e.g. 1002,
+    on a machine with the given memory backend.
+
+    The function is specialized for the parameter modes of ins, so it
+    never has to decode them again. Handlers are shared by all machines.
+    """
+    if (memory, ins) in _handlers:
+        return _handlers[memory, ins]
+
+    opcode = ins % 100
+    assert opcode in OPS, "illegal opcode: {}".format(opcode)
+    name, size, _ = OPS[opcode]
+    prelude, _ = MEMORY[memory]
+    fname = "{}_{}".format(name, ins).replace("-", "m")  # -1 % 100 is a halt
+    src = "def {}(vm, n, a, b, c):\n    {}\n    {}\n".format(
+        fname, prelude, _body(ins, memory, ["a", "b", "c"]))
+    env = {"_Blocked": _Blocked}
+    exec(src, env)
+    fn = env[fname]
+    fn.ins, fn.opcode, fn.op, fn.size = ins, opcode, name, size
+    fn.fused = False
+    _handlers[memory, ins] = fn, size
+    return fn, size
+
+
+# Straight line instructions that can be fused with the ones after them
+FUSABLE = {1, 2, 7, 8, 9}
+MAX_FUSED = 8
+
+# A comparison whose result is the condition of the jump after it
+_FORWARD = {
+    7: "f = 1 if {r1} < {r2} else 0\n    vm.store({w3}, f)",
+    8: "f = 1 if {r1} == {r2} else 0\n    vm.store({w3}, f)",
+}
+
+
+def fused_handler(words: Tuple[int, ...], memory="list", forward=False):
+    """
+    The function executing the instructions words in a row, called as
+    fn(vm, n, args, None, None) with the arguments of all of them in args.
+    It ends with a jump if the last word is one, otherwise it returns n.
+    With forward, the last two are a comparison and a jump on its result,
+    which is used without reading it back.
+    """
+    key = (memory, words, forward)
+    if key in _handlers:
+        return _handlers[key]
+
+    names = []
+    lines = [MEMORY[memory][0]]
+    for k, ins in enumerate(words):
+        size = OPS[ins % 100][1]
+        args = ["x{}".format(len(names) + i) for i in range(size - 1)]
+        names += args
+        if forward and k == len(words) - 2:
+            lines.append(_body(ins, memory, args, _FORWARD[ins % 100]))
+        elif forward and k == len(words) - 1:
+            lines.append(_body(ins, memory, args, params={"r1": "f"}))
+        else:
+            body = _body(ins, memory, args)
+            if ins % 100 in FUSABLE:
+                assert body.endswith("\n    return n")
+                body = body[:-len("\n    return n")]
+            lines.append(body)
+    if words[-1] % 100 in FUSABLE:
+        lines.append("return n")
+    lines.insert(1, "{}, = a".format(", ".join(names)))
+
+    name = ("fused_" + "_".join(map(str, words))).replace("-", "m")
+    src = "def {}(vm, n, a, b, c):\n    {}\n".format(name, "\n    ".join(lines))
+    env = {"_Blocked": _Blocked}
+    exec(src, env)
+    fn = env[name]
+    fn.words, fn.fused = words, True
+    _handlers[key] = fn
+    return fn
+
+
+class Program:
+    """
+    An Intcode machine.
+
+    mem is used in place, so callers holding a reference to the list see
+    every write the program makes. With memory="paged", or when mem is a
+    PagedMemory, memory is kept in pages allocated on demand instead, for
+    programs that write far beyond their image. inp and out are deques;
+    input is consumed from the left and output appended to the right.
+    With max_out, only the latest max_out outputs are kept.
+
+    Instructions are decoded once into (handler, next, a, b, c) records
+    that are cached by address. Writes made by the program into a decoded
+    instruction drop its record. Code changed from outside the machine
+    must be written with store() for the same reason. Straight line
+    instructions are fused with the ones after them into one record, up
+    to a jump, unless their code has been rewritten before.
+
+    With compiled=True the image is compiled to Python, see
+    intcode.compiler, and the interpreter only runs code the compiler did
+    not find or after the program wrote into its compiled code.
+
+    tracer, if given, is called as tracer(vm, pos, handler, a, b, c)
+    before every instruction, and before a read once it has input, see
+    intcode.trace. debug=True attaches a LogTracer. Without a tracer the
+    interpreter loop does no tracing work at all. Tracing always uses the
+    interpreter.
+
+    on_input, if given, is called when the program reads with no input
+    queued, and returns the value to read, or None to block as usual.
+    """
+
+    def __init__(self, mem, inp=(), *, memory="list", compiled=False, max_out=None,
+                 debug=False, tracer=None, on_input: Optional[Callable[[], Optional[int]]] = None):
+        image = mem
+        if isinstance(mem, PagedMemory):
+            assert not compiled, "can only compile a list image"
+            memory = "paged"
+        elif memory == "paged":
+            mem = PagedMemory(mem)
+        assert memory in MEMORY, "unknown memory backend: {}".format(memory)
+        self.memory = memory
+        self._set_mem(mem)
+        self.inp = deque(inp)
+        self.out = deque(maxlen=max_out)
+        self.pos = 0
+        self.rb = 0
+        if debug and tracer is None:
+            from .trace import LogTracer
+            tracer = LogTracer()
+        self.tracer = tracer
+        self.on_input = on_input
+        self._code = {}  # address -> decoded instruction
+        self._cells = {}  # address -> addresses of decoded instructions covering it, or _COMPILED and _WATCHED
+        self._compiled = None
+        self._rewritten = set()  # addresses of records dropped by writes, never fused again
+        self._watch_write = {}  # address -> callbacks
+        self._watch_read = {}  # address -> callbacks
+        self._breaks = {}  # address -> callbacks
+        self._steps = None  # steps left to run, or None
+        if compiled:
+            from .compiler import compile_program
+            self._compiled = compile_program(image, memory)
+            self.invalidate()
+
+    def feed(self, values: Iterable[int]) -> None:
+        """Queue input values"""
+        self.inp.extend(values)
+
+    def drain(self) -> List[int]:
+        """Remove and return all queued output"""
+        out = list(self.out)
+        self.out.clear()
+        return out
+
+    def is_done(self) -> bool:
+        return self.pos is None
+
+    def needs_input(self) -> bool:
+        """True if the next instruction is a read and there is no input queued"""
+        return self.pos is not None and self.load(self.pos) % 100 == 3 and not self.inp
+
+    def _set_mem(self, mem) -> None:
+        self.mem = mem
+        if self.memory == "paged":
+            self.load, self.store = mem.__getitem__, self._store_paged
+        else:
+            self.load, self.store = self._load_list, self._store_list
+
+    def _copy_mem(self):
+        return self.mem.copy() if self.memory == "paged" else self.mem[:]
+
+    def snapshot(self) -> Snapshot:
+        """
+        The state of the machine, to restore() or fork() later. Paged
+        memory is shared copy-on-write with the machine, list memory is
+        copied.
+        """
+        return Snapshot(self._copy_mem(), self.pos, self.rb, tuple(self.inp), tuple(self.out))
+
+    def restore(self, snap: Snapshot) -> None:
+        """Reset the machine to a snapshot of it, which can be restored again"""
+        assert isinstance(snap.mem, PagedMemory) == (self.memory == "paged"), "memory backend differs"
+        self._set_mem(snap.mem.copy() if self.memory == "paged" else snap.mem[:])
+        self.pos, self.rb = snap.pos, snap.rb
+        self.inp = deque(snap.inp)
+        self.out = deque(snap.out, maxlen=self.out.maxlen)
+        c = self._compiled
+        if c is not None and any(self.load(a) != v for a, v in c.words.items()):
+            # the snapshot holds other code than the compiled one
+            from .compiler import compile_program
+            self._compiled = compile_program(self.mem if self.memory == "list" else self.mem.tolist(), self.memory)
+        self.invalidate()
+
+    def save(self, path: str) -> None:
+        """Write a checkpoint of the machine to path, see intcode.checkpoint"""
+        from .checkpoint import save
+        save(self, path)
+
+    @staticmethod
+    def resume(path: str) -> "Program":
+        """A machine in the state of the checkpoint saved to path"""
+        from .checkpoint import load
+        return load(path)
+
+    def predecode(self) -> None:
+        """
+        Decode the instructions reachable from address 0 now, instead of
+        when they first run, so that forks of this machine share them.
+        """
+        from .compiler import discover
+        _, instructions = discover(self.mem if self.memory == "list" else self.mem.tolist())
+        for pos in instructions:
+            if pos not in self._code:
+                self.decode(pos)
+
+    def fork(self) -> "Program":
+        """
+        A new machine in the same state, sharing decoded and compiled
+        code. With paged memory the two share memory pages until either
+        writes to them.
+        """
+        p = Program(self._copy_mem(), self.inp, memory=self.memory, max_out=self.out.maxlen)
+        p.out.extend(self.out)
+        p.pos, p.rb = self.pos, self.rb
+        p._compiled = self._compiled
+        p._code = dict(self._code)
+        p._cells = dict(self._cells)
+        p._rewritten = set(self._rewritten)
+        p._watch_write = {a: fns[:] for a, fns in self._watch_write.items()}
+        p._watch_read = {a: fns[:] for a, fns in self._watch_read.items()}
+        p._breaks = {a: fns[:] for a, fns in self._breaks.items()}
+        return p
+
+    # load(addr) and store(addr, value) are bound to one of these
+
+    def _load_list(self, addr) -> int:
+        if addr >= len(self.mem):
+            return 0  # uninitialized memory
+        return self.mem[addr]
+
+    def _store_list(self, addr, value) -> None:
+        watched = addr in self._cells and self.invalidate(addr)
+        if addr >= len(self.mem):
+            self.mem.extend(0 for _ in range(addr - len(self.mem) + 100))
+        self.mem[addr] = value
+        if watched:
+            for fn in self._watch_write[addr]:
+                fn(self, addr, value)
+
+    def _store_paged(self, addr, value) -> None:
+        watched = addr in self._cells and self.invalidate(addr)
+        self.mem[addr] = value
+        if watched:
+            for fn in self._watch_write[addr]:
+                fn(self, addr, value)
+
+    def invalidate(self, addr=None) -> bool:
+        """
+        Forget decoded instructions covering addr, or all of them. Returns
+        True if writes to addr are watched.
+        """
+        if addr is None:
+            self._code.clear()
+            self._cells.clear()
+            if self._compiled is not None:
+                for a in self._compiled.code:
+                    self._cells[a] = (_COMPILED,)
+            for a in self._watch_write:
+                self._cells[a] = self._cells.get(a, ()) + (_WATCHED,)
+            return False
+        watched = False
+        for pos in self._cells.pop(addr, ()):
+            if pos == _WATCHED:
+                watched = True
+            elif pos == _COMPILED:
+                self._compiled = None  # compiled code no longer matches memory
+            elif self._code.pop(pos, None) is not None:
+                self._rewritten.add(pos)
+        if watched:
+            self._cells[addr] = (_WATCHED,)
+        return watched
+
+    def _hooks(self) -> None:
+        """Leave compiled code, which does not call hooks, and decode everything again"""
+        self._compiled = None
+        self.invalidate()
+
+    def watch(self, addr: int, fn, *, write=True, read=False) -> None:
+        """
+        Call fn(vm, addr, value) after every write of value to addr, and
+        with read, before every instruction reading value from addr.
+
+        A write watch costs nothing for other addresses. A read watch
+        makes instructions that may read addr, including every instruction
+        reading through the relative base, check their addresses, and
+        stops instructions from being fused. Hooks make the machine use
+        the interpreter.
+        """
+        if write:
+            self._watch_write.setdefault(addr, []).append(fn)
+        if read:
+            self._watch_read.setdefault(addr, []).append(fn)
+        self._hooks()
+
+    def unwatch(self, addr: int) -> None:
+        """Remove all watches of addr"""
+        self._watch_write.pop(addr, None)
+        self._watch_read.pop(addr, None)
+        self.invalidate()
+
+    def break_at(self, pos: int, fn) -> None:
+        """
+        Call fn(vm, pos) before every execution of the instruction at pos.
+        The callback may change the machine, but not its pos.
+        """
+        self._breaks.setdefault(pos, []).append(fn)
+        self._hooks()
+
+    def clear_break(self, pos: int) -> None:
+        self._breaks.pop(pos, None)
+        self.invalidate()
+
+    def _hook(self, pos, rec):
+        """rec with the breakpoints at pos and the read watches it may hit"""
+        h, n, a, b, c = rec
+        breaks = tuple(self._breaks.get(pos, ()))  # forks share records, not later breakpoints
+        reads = []
+        if self._watch_read:
+            modes = (h.ins // 100 % 10, h.ins // 1000 % 10, h.ins // 10000 % 10)
+            body = OPS[h.opcode][2]
+            for i, arg in enumerate((a, b, c)[:h.size - 1]):
+                if "{{r{}}}".format(i + 1) in body:
+                    if modes[i] == 2 or (modes[i] == 0 and arg in self._watch_read):
+                        reads.append((modes[i], arg))
+        if not breaks and not reads:
+            return rec
+
+        def hooked(vm, n, a, b, c):
+            for fn in breaks:
+                fn(vm, pos)
+            for mode, arg in reads:
+                addr = arg if mode == 0 else vm.rb + arg
+                for fn in vm._watch_read.get(addr, ()):
+                    fn(vm, addr, vm.load(addr))
+            return h(vm, n, a, b, c)
+
+        hooked.__dict__.update(h.__dict__)
+        return hooked, n, a, b, c
+
+    def _single(self, pos):
+        """The record of the instruction at pos alone"""
+        assert pos >= 0, "program counter out of range: {}".format(pos)
+        load = self.load
+        h, size = handler(load(pos), self.memory)
+        rec = h, pos + size, load(pos + 1), load(pos + 2), load(pos + 3)
+        if self._breaks or self._watch_read:
+            rec = self._hook(pos, rec)
+        return rec
+
+    def _fuse(self, pos, rec):
+        """
+        The record of rec fused with the straight line instructions after
+        it, up to and including a jump, or None.
+
+        A member writing to a cell that is not known to be outside the
+        group is its last member, so no member runs with operands that
+        changed after the group was decoded. Every cell of the group drops
+        it when it is written to, like any other record.
+        """
+        load = self.load
+        words, args, targets = [], [], []
+        q = pos
+        while len(words) < MAX_FUSED:
+            ins = load(q)
+            if not _valid(ins) or ins % 100 not in FUSABLE | {5, 6}:
+                break
+            size = OPS[ins % 100][1]
+            if any(q <= t < q + size for t in targets) or q in self._breaks:
+                break
+            words.append(ins)
+            args += [load(q + 1 + i) for i in range(size - 1)]
+            q += size
+            if ins % 100 in (5, 6):
+                break
+            mode = ins // 10 ** size % 10 if ins % 100 != 9 else None
+            if mode == 2:
+                break  # writes somewhere through the relative base
+            if mode == 0:
+                targets.append(args[-1])
+        if len(words) < 2:
+            return None
+
+        forward = (words[-1] % 100 in (5, 6) and words[-1] // 100 % 10 == 0 and words[-2] % 100 in (7, 8)
+                   and words[-2] // 10000 % 10 == 0 and args[-3] == args[-2])
+        return fused_handler(tuple(words), self.memory, forward), q, tuple(args), None, None
+
+    def decode(self, pos):
+        rec = self._single(pos)
+        if (self.tracer is None and rec[0].opcode in FUSABLE and pos not in self._rewritten
+                and pos not in self._breaks and not self._watch_read):
+            rec = self._fuse(pos, rec) or rec
+        self._code[pos] = rec
+        cells = self._cells
+        for addr in range(pos, rec[1]):
+            at = cells.get(addr, ())
+            if pos not in at:  # still there if another cell of it was written
+                cells[addr] = at + (pos,)
+        return rec
+
+    def _execute(self, stop_on_output, steps=None) -> bool:
+        """
+        Run until halted, blocked on input or, with stop_on_output, until
+        there is output. With steps, also stop after that many steps, see
+        outputs(), and leave the steps not run in _steps. Returns False if
+        it stopped because it is blocked.
+        """
+        self._steps = steps
+        while True:
+            try:
+                if self._compiled is not None and self.tracer is None:
+                    self._run_compiled(stop_on_output)
+                else:
+                    self._interpret(stop_on_output)
+                return True
+            except _Blocked:
+                v = self.on_input() if self.on_input is not None else None
+                if v is None:
+                    return False
+                self.inp.append(v)
+
+    def _run_compiled(self, stop_on_output) -> None:
+        while self._compiled is not None:
+            if self._compiled.run(self, stop_on_output):
+                return
+            # Compiled code writes memory without dropping decoded records
+            self.invalidate()
+            if self._compiled is not None:
+                self._interpret(stop_on_output, self._compiled.blocks)
+            if self.pos is None or (stop_on_output and self.out) or self._steps == 0:
+                return
+        self._interpret(stop_on_output)
+
+    def _interpret(self, stop_on_output, until=None) -> None:
+        """
+        Interpret until halted or, with stop_on_output, until there is
+        output. With until, also stop at an address in it, and with _steps
+        set, after that many steps. Raises _Blocked when it needs input.
+        """
+        code = self._code
+        decode = self.decode
+        out = self.out
+        pos = self.pos
+        trace = self.tracer
+        steps = self._steps
+        try:
+            if trace is not None:
+                while pos is not None and steps != 0:
+                    if stop_on_output and out:
+                        break
+                    h, n, a, b, c = code.get(pos) or decode(pos)
+                    if h.fused:
+                        h, n, a, b, c = self._single(pos)
+                    if h.opcode != 3 or self.inp:  # a blocked read is traced when it runs
+                        trace(self, pos, h, a, b, c)
+                    pos = h(self, n, a, b, c)
+                    if steps is not None:
+                        steps -= 1
+            elif until is not None or steps is not None:
+                until = until or ()
+                while pos is not None and pos not in until and steps != 0:
+                    if stop_on_output and out:
+                        break
+                    h, n, a, b, c = code.get(pos) or decode(pos)
+                    pos = h(self, n, a, b, c)
+                    if steps is not None:
+                        steps -= 1
+            else:
+                while pos is not None:
+                    if stop_on_output and out:
+                        break
+                    try:
+                        h, n, a, b, c = code[pos]
+                    except KeyError:
+                        h, n, a, b, c = decode(pos)
+                    pos = h(self, n, a, b, c)
+        finally:
+            self.pos = pos
+            self._steps = steps
+
+    def run(self) -> None:
+        """Run until the program halts"""
+        ok = self._execute(False)
+        assert ok, "program needs input at {}".format(self.pos)
+
+    def run_until_output(self) -> Optional[int]:
+        """
+        Run until there is an output value and return it, or return None
+        if the program halts first.
+        """
+        if not self.out:
+            ok = self._execute(True)
+            assert ok, "program needs input at {}".format(self.pos)
+        if self.out:
+            return self.out.popleft()
+        return None
+
+    def run_until_input(self) -> None:
+        """
+        Run until the program halts or is about to read with no input
+        queued.
+        """
+        self._execute(False)
+
+    run_out = run_until_output
+    run_in = run_until_input
+
+    def outputs(self, n=1, steps=None) -> Iterator:
+        """
+        Run the program and yield its output values as they are produced,
+        or tuples of n values. Stops when the program halts, or when it
+        blocks on input that on_input does not give; feed it and iterate
+        again to go on. Values of an incomplete tuple are left in out.
+
+        With steps, also stops after running that many steps in total. A
+        step is an instruction, a run of fused instructions or a block of
+        compiled code, so it bounds the time taken by programs that loop
+        without output. needs_input() tells the two stops apart.
+        """
+        out = self.out
+        group = []
+        try:
+            while True:
+                while out:
+                    if n == 1:
+                        yield out.popleft()
+                        continue
+                    group.append(out.popleft())
+                    if len(group) == n:
+                        values, group = tuple(group), []
+                        yield values
+                if self.pos is None or steps == 0 or not self._execute(True, steps):
+                    return
+                steps = self._steps
+        finally:
+            out.extendleft(reversed(group))
+
+    def step(self) -> None:
+        """Execute a single instruction"""
+        pos = self.pos
+        h, n, a, b, c = self._code.get(pos) or self.decode(pos)
+        if h.fused:
+            h, n, a, b, c = self._single(pos)
+        if self.tracer is not None and (h.opcode != 3 or self.inp):
+            self.tracer(self, pos, h, a, b, c)
+        try:
+            self.pos = h(self, n, a, b, c)
+        except _Blocked:
+            assert False, "program needs input at {}".format(pos)
@@ -0,0 +1,66 @@
+"""
+Render coordinate maps as text, raw image bytes or ANSI updates.
+
+A map is a dict of (x, y) -> value, or a Grid. Values are small ints
+that fit in a byte. A map is first laid out as one bytes object holding
+the cells within its bounds, row by row. That takes one pass over its
+cells, or one slice per row of a Grid. Text is then made with a single
+str.translate of all cells by a palette of value -> character, cut into
+rows, and written with a single write().
+"""
+from typing import Dict, Iterable, Optional, Tuple
+import sys
+
+from .grid import Grid
+
+
+BW = {0: "█", 1: " "}  # black and white paint
+GRAY = {0: 0, 1: 255}  # black and white pixels
+
+
+def raster(coords, default=0) -> Tuple[bytes, int, int]:
+    """(cells, width, height) of the cells of coords within its bounds, default where it has none"""
+    if isinstance(coords, Grid):
+        return coords.raster()
+    if not coords:
+        return b"", 0, 0
+    xs, ys = zip(*coords)
+    minx, miny = min(xs), min(ys)
+    width, height = max(xs) - minx + 1, max(ys) - miny + 1
+    cells = bytearray([default]) * (width * height)
+    for (x, y), v in coords.items():
+        cells[(y - miny) * width + x - minx] = v
+    return bytes(cells), width, height
+
+
+def text(coords, palette: Dict[int, str], default=0) -> str:
+    """The rows of coords drawn with palette, each ending with a newline"""
+    cells, width, _ = raster(coords, default)
+    rows = cells.decode("latin-1").translate(palette)
+    return "".join(rows[i:i + width] + "\n" for i in range(0, len(rows), width or 1))
+
+
+def show(coords, palette: Dict[int, str], default=0, out=None) -> None:
+    """Write text(coords, palette) to out, or stdout, in one write"""
+    (out or sys.stdout).write(text(coords, palette, default))
+
+
+def pgm(coords, shades: Dict[int, int] = GRAY, default=0) -> bytes:
+    """
+    A binary PGM image of coords, one byte per cell after a short text
+    header, with values mapped to gray levels by shades
+    """
+    cells, width, height = raster(coords, default)
+    table = bytes(shades.get(v, v) for v in range(256))
+    return b"P5\n%d %d\n255\n" % (width, height) + cells.translate(table)
+
+
+def ansi(coords, cells: Iterable[Tuple[int, int]], palette: Dict[int, str],
+         origin: Optional[Tuple[int, int]] = None) -> str:
+    """
+    ANSI escapes that move the cursor to each of cells and draw its value
+    in coords. The cell at origin, (0, 0) by default, is drawn at the top
+    left corner of the terminal.
+    """
+    ox, oy = origin or (0, 0)
+    return "".join("\x1b[{};{}H{}".format(y - oy + 1, x - ox + 1, palette[coords[x, y]]) for x, y in cells)
@@ -0,0 +1,153 @@
+"""
+Run many Intcode machines round robin, routing packets between them by
+address.
+
+A machine's output is split into packets of size values, the first of
+which is the address to deliver the rest to, or with a fixed destination
+every value is sent there. Each turn runs one machine until it blocks on
+input, halts, has sent quantum packets or has run steps instructions,
+and delivering a packet makes its machine runnable again. A machine
+that computes without sending is stopped by its steps and runs again
+after the others. Blocked machines are not run at all, so a
+round costs the machines that have work, not every machine.
+
+    s = Scheduler()
+    for i in range(50):
+        s.add(Program(image[:]), inp=[i])
+    s.route(255, lambda packet: ...)
+    s.run()
+
+run() returns when no machine can run, or when stop() is called.
+Programs that poll, reading a value like -1 when there is no packet, are
+given empty once each time they block, and are only parked if that did
+not make them send anything.
+"""
+from collections import deque
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .program import Program
+
+
+class Scheduler:
+    """
+    runnable, blocked and halted hold the addresses of the machines in
+    each state. Packets to addresses without a machine or a route are
+    kept in dropped.
+    """
+
+    def __init__(self, size=3, quantum=16, empty: Optional[int] = None, steps=10000):
+        self.size = size
+        self.quantum = quantum
+        self.steps = steps
+        self.empty = empty
+        self.machines = {}  # type: Dict[int, Program]
+        self.routes = {}  # type: Dict[int, Callable[[Tuple[int, ...]], None]]
+        self.runnable = set()
+        self.blocked = set()
+        self.halted = set()
+        self.dropped = []  # type: List[Tuple[int, Tuple[int, ...]]]
+        self.slices = 0
+        self.packets = 0
+        self._to = {}  # address -> fixed destination
+        self._order = deque()  # runnable addresses in turn
+        self._polled = set()  # addresses given empty since their last packet
+        self._stopped = False
+
+    def add(self, program: Program, address: Optional[int] = None, inp: Iterable[int] = (),
+            to: Optional[int] = None) -> int:
+        """
+        Add a machine at address, the next free one by default, with
+        initial input. With to, all its output goes to that address.
+        Returns the address.
+        """
+        if address is None:
+            address = len(self.machines)
+        assert address not in self.machines, "address {} is taken".format(address)
+        self.machines[address] = program
+        if to is not None:
+            self._to[address] = to
+        program.feed(inp)
+        if program.is_done():
+            self.halted.add(address)
+        else:
+            self._ready(address)
+        return address
+
+    def route(self, address: int, fn: Callable[[Tuple[int, ...]], None]) -> None:
+        """Call fn(packet) with every packet sent to address"""
+        self.routes[address] = fn
+
+    def send(self, address: int, packet: Sequence[int]) -> None:
+        """Deliver packet to the machine or route at address"""
+        self.packets += 1
+        p = self.machines.get(address)
+        if p is not None:
+            p.feed(packet)
+            self._polled.discard(address)
+            if address in self.blocked:
+                self.blocked.remove(address)
+                self._ready(address)
+        elif address in self.routes:
+            self.routes[address](tuple(packet))
+        else:
+            self.dropped.append((address, tuple(packet)))
+
+    def stop(self) -> None:
+        """Make run() return after the current turn"""
+        self._stopped = True
+
+    @property
+    def deadlocked(self) -> bool:
+        """True if machines are waiting for input and no machine can run"""
+        return not self.runnable and bool(self.blocked)
+
+    def _ready(self, address: int) -> None:
+        if address not in self.runnable:
+            self.runnable.add(address)
+            self._order.append(address)
+
+    def _turn(self, address: int) -> None:
+        p = self.machines[address]
+        to = self._to.get(address)
+        n = 0
+        if to is not None:
+            for v in islice(p.outputs(steps=self.steps), self.quantum):
+                self.send(to, (v,))
+                n += 1
+        else:
+            for packet in islice(p.outputs(self.size, self.steps), self.quantum):
+                self.send(packet[0], packet[1:])
+                n += 1
+        self.slices += 1
+
+        if p.is_done():
+            self.halted.add(address)
+        elif n == self.quantum or p.inp or not p.needs_input():  # out of steps
+            self._ready(address)
+        elif self.empty is not None and (n or address not in self._polled):
+            self._polled.add(address)
+            p.feed([self.empty])
+            self._ready(address)
+        else:
+            self.blocked.add(address)
+
+    def run(self, on_idle: Optional[Callable[["Scheduler"], None]] = None) -> bool:
+        """
+        Run machines in turn until none can run. Then on_idle, if given,
+        is called and may send packets to go on. Returns True if stopped
+        by stop().
+        """
+        self._stopped = False
+        while not self._stopped:
+            if not self._order:
+                if on_idle is None:
+                    break
+                on_idle(self)
+                if not self._order:
+                    break
+                continue
+            address = self._order.popleft()
+            self.runnable.remove(address)
+            self._turn(address)
+        return self._stopped
@@ -0,0 +1,117 @@
+"""
+Evaluate many candidate inputs to one Intcode image on a process pool.
+
+Every worker gets the image once, when it starts, and builds a predecoded
+base machine from it. Candidates are sent in chunks, and each one is
+evaluated as run(base, candidate), where run is a module level function
+that forks base. Results stream back in the order of the candidates,
+and leaving the iteration early stops the workers. Starting a pool costs
+more than running a few hundred cheap candidates, so short sweeps run in
+the calling process.
+"""
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+import itertools
+import multiprocessing
+import time
+
+from .program import Program
+
+
+_base = None  # type: Optional[Program]
+_run = None  # type: Optional[Callable[[Program, Any], Any]]
+
+
+def _init(image, run) -> None:
+    global _base, _run
+    _base = Program(image)
+    _base.predecode()
+    _run = run
+
+
+def _work(chunk) -> List[Tuple[Any, Any]]:
+    return [(c, _run(_base, c)) for c in chunk]
+
+
+def _chunks(it, n) -> Iterator[list]:
+    it = iter(it)
+    while True:
+        chunk = list(itertools.islice(it, n))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Sweep:
+    """
+    Iterate over (candidate, run(base, candidate)) in candidate order.
+
+    With processes=1, or at most serial candidates, everything runs in
+    this process. Use as a context manager, or call close(), to stop the
+    workers when leaving early. evaluated and seconds count the results
+    seen so far.
+    """
+
+    def __init__(self, image: List[int], candidates: Iterable, run: Callable[[Program, Any], Any], *,
+                 processes: Optional[int] = None, chunksize=64, serial=1000):
+        self.image = image
+        self.candidates = candidates
+        self.run = run
+        self.processes = processes
+        self.chunksize = chunksize
+        self.serial = serial
+        self.evaluated = 0
+        self.seconds = 0.0
+        self._pool = None
+
+    def __iter__(self) -> Iterator[Tuple[Any, Any]]:
+        start = time.perf_counter()
+        it = iter(self.candidates)
+        head = list(itertools.islice(it, self.serial + 1))
+        candidates = itertools.chain(head, it)
+        if self.processes == 1 or len(head) <= self.serial:
+            _init(self.image, self.run)
+            results = map(_work, _chunks(candidates, self.chunksize))
+        else:
+            self._pool = multiprocessing.Pool(self.processes, _init, (self.image, self.run))
+            results = self._pool.imap(_work, _chunks(candidates, self.chunksize))
+        try:
+            for chunk in results:
+                for r in chunk:
+                    self.evaluated += 1
+                    self.seconds = time.perf_counter() - start
+                    yield r
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def rate(self) -> float:
+        """Candidates evaluated per second"""
+        return self.evaluated / self.seconds if self.seconds else 0.0
+
+    def report(self) -> str:
+        return "{} candidates in {:.3f}s ({:.0f}/s)".format(self.evaluated, self.seconds, self.rate())
+
+
+def search(image: List[int], candidates: Iterable, run: Callable[[Program, Any], Any],
+           found: Callable[[Any, Any], bool], **kwargs) -> Optional[Tuple[Any, Any]]:
+    """
+    The first (candidate, value) in candidate order for which
+    found(candidate, value) is true, or None. Stops the remaining work as soon as it is found. kwargs are
+    passed on to Sweep.
+    """
+    with Sweep(image, candidates, run, **kwargs) as sweep:
+        for candidate, value in sweep:
+            if found(candidate, value):
+                return candidate, value
+    return None
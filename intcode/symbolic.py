@@ -0,0 +1,232 @@
+"""
+Run Intcode programs on symbolic inputs.
+
+Cells given as symbols hold polynomials in them instead of numbers, and
+add and mul build new polynomials, so the cell a program leaves its
+result in ends up as a closed form of its inputs. Reading through an
+address that depends on the symbols gives an unknown value, which is
+fine as long as it is overwritten before it matters. Anything that needs
+an unknown or symbolic value to be a number, like an opcode, an address
+written to or a comparison, raises NotSymbolic.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .disasm import decode
+
+
+class NotSymbolic(Exception):
+    """Raised when a program can not be run on symbols"""
+
+
+class _Unknown:
+    def __repr__(self):
+        return "?"
+
+
+UNKNOWN = _Unknown()
+
+
+class Poly:
+    """A polynomial with integer coefficients in symbols x0, x1, ..."""
+
+    def __init__(self, terms: Dict[Tuple[int, ...], int]):
+        self.terms = {e: c for e, c in terms.items() if c}  # exponents -> coefficient
+
+    @staticmethod
+    def var(i: int, n: int) -> "Poly":
+        return Poly({tuple(int(j == i) for j in range(n)): 1})
+
+    def degree(self) -> int:
+        return max((sum(e) for e in self.terms), default=0)
+
+    def coefficient(self, *exponents) -> int:
+        return self.terms.get(exponents, 0)
+
+    def __add__(self, other):
+        if isinstance(other, int):
+            other = Poly({(0,) * len(next(iter(self.terms), ())): other})
+        terms = dict(self.terms)
+        for e, c in other.terms.items():
+            terms[e] = terms.get(e, 0) + c
+        return Poly(terms)
+
+    __radd__ = __add__
+
+    def __mul__(self, other):
+        if isinstance(other, int):
+            return Poly({e: c * other for e, c in self.terms.items()})
+        terms = {}
+        for e1, c1 in self.terms.items():
+            for e2, c2 in other.terms.items():
+                e = tuple(a + b for a, b in zip(e1, e2))
+                terms[e] = terms.get(e, 0) + c1 * c2
+        return Poly(terms)
+
+    __rmul__ = __mul__
+
+    def __call__(self, *values) -> int:
+        total = 0
+        for e, c in self.terms.items():
+            for v, k in zip(values, e):
+                c *= v ** k
+            total += c
+        return total
+
+    def __repr__(self):
+        parts = []
+        for e, c in sorted(self.terms.items(), reverse=True):
+            factors = ["x{}".format(i) + ("^{}".format(k) if k > 1 else "") for i, k in enumerate(e) if k]
+            if c != 1 or not factors:
+                factors.insert(0, str(c))
+            parts.append("*".join(factors))
+        return " + ".join(parts) or "0"
+
+
+def _simplify(v):
+    """v as an int if it is a constant polynomial"""
+    if isinstance(v, Poly) and all(not any(e) for e in v.terms):
+        return sum(v.terms.values())
+    return v
+
+
+def _int(v, what: str) -> int:
+    if not isinstance(v, int):
+        raise NotSymbolic("{} is not a number: {}".format(what, v))
+    return v
+
+
+def run(image: List[int], symbols: Sequence[int], max_steps=10**6) -> List:
+    """
+    Run image with the cells at the addresses in symbols replaced by the
+    symbols x0, x1, ... and return its memory, where cells are ints, Polys
+    or UNKNOWN. Only add, mul, jumps with a numeric condition, arb and halt
+    are supported.
+    """
+    mem = list(image)
+    for i, addr in enumerate(symbols):
+        mem[addr] = Poly.var(i, len(symbols))
+
+    def cell(addr):
+        if not isinstance(addr, int):
+            return UNKNOWN  # the address depends on the symbols
+        assert addr >= 0, "negative address"
+        return mem[addr] if addr < len(mem) else 0
+
+    def store(addr, value):
+        addr = _int(addr, "address written to")
+        if addr >= len(mem):
+            mem.extend(0 for _ in range(addr - len(mem) + 1))
+        mem[addr] = value
+
+    pos, rb = 0, 0
+    for _ in range(max_steps):
+        ins = _int(cell(pos), "instruction at {}".format(pos))
+        d = decode([ins] + [0, 0, 0], 0)
+        if d is None:
+            raise NotSymbolic("illegal instruction at {}: {}".format(pos, ins))
+        opcode, modes, _ = d
+        args = [cell(pos + 1 + i) for i in range(len(modes))]
+        read = lambda i: args[i] if modes[i] == 1 else cell(args[i] if modes[i] == 0 else _add(rb, args[i]))
+        write = lambda i: args[i] if modes[i] == 0 else _add(rb, args[i])
+
+        if opcode == 1:
+            store(write(2), _add(read(0), read(1)))
+        elif opcode == 2:
+            store(write(2), _mul(read(0), read(1)))
+        elif opcode in (5, 6):
+            cond = _int(read(0), "jump condition at {}".format(pos))
+            if (cond != 0) == (opcode == 5):
+                pos = _int(read(1), "jump target at {}".format(pos))
+                continue
+        elif opcode == 9:
+            rb = _int(_add(rb, read(0)), "relative base")
+        elif opcode == 99:
+            return mem
+        else:
+            raise NotSymbolic("unsupported instruction at {}: {}".format(pos, ins))
+        pos += len(modes) + 1
+    raise NotSymbolic("no halt within {} steps".format(max_steps))
+
+
+def _add(x, y):
+    if x is UNKNOWN or y is UNKNOWN:
+        return UNKNOWN
+    return _simplify(x + y)
+
+
+def _mul(x, y):
+    if x is UNKNOWN or y is UNKNOWN:
+        return UNKNOWN
+    return _simplify(x * y)
+
+
+def evaluate(image: List[int], symbols: Sequence[int] = (1, 2), result=0):
+    """The value image leaves at result, as an int or Poly in the symbols"""
+    v = run(image, symbols)[result]
+    if v is UNKNOWN:
+        raise NotSymbolic("result depends on memory the symbols point to")
+    return v
+
+
+def _egcd(a, b) -> Tuple[int, int, int]:
+    """(g, s, t) with a*s + b*t == g == gcd(a, b)"""
+    if b == 0:
+        return a, 1, 0
+    g, s, t = _egcd(b, a % b)
+    return g, t, s - a // b * t
+
+
+def _ceil(a, b):
+    return -(-a // b)
+
+
+def solve(image: List[int], target: int, nouns: range, verbs: range) -> Optional[Tuple[int, int]]:
+    """
+    The (noun, verb) with the lowest noun, then verb, in the ranges for
+    which image leaves target in cell 0 with noun in cell 1 and verb in
+    cell 2, or None. Linear programs are solved directly, others are
+    searched with the polynomial. Raises NotSymbolic for programs that
+    can not be evaluated symbolically.
+    """
+    assert nouns.step == verbs.step == 1, "ranges must have step 1"
+    f = evaluate(image)
+    if isinstance(f, int):
+        return (nouns.start, verbs.start) if f == target and nouns and verbs else None
+    if f.degree() > 1:
+        for noun in nouns:
+            for verb in verbs:
+                if f(noun, verb) == target:
+                    return noun, verb
+        return None
+
+    # a*noun + b*verb == r
+    a, b, r = f.coefficient(1, 0), f.coefficient(0, 1), target - f.coefficient(0, 0)
+    if not nouns or not verbs:
+        return None
+    if b == 0:
+        if r % a or r // a not in nouns:
+            return None
+        return r // a, verbs.start
+    if a == 0:
+        if r % b or r // b not in verbs:
+            return None
+        return nouns.start, r // b
+
+    g, s, t = _egcd(a, b)
+    if r % g:
+        return None
+    # noun = s*r/g + k*b/g, verb = t*r/g - k*a/g
+    n0, v0, dn, dv = s * r // g, t * r // g, b // g, -a // g
+    lo, hi = None, None
+    for x0, dx, rng in ((n0, dn, nouns), (v0, dv, verbs)):
+        first, last = rng.start, rng.stop - 1
+        if dx > 0:
+            kl, kh = _ceil(first - x0, dx), (last - x0) // dx
+        else:
+            kl, kh = _ceil(last - x0, dx), (first - x0) // dx
+        lo = kl if lo is None else max(lo, kl)
+        hi = kh if hi is None else min(hi, kh)
+    if lo > hi:
+        return None
+    k = lo if dn > 0 else hi
+    return n0 + k * dn, v0 + k * dv
@@ -0,0 +1,95 @@
+from collections import namedtuple
+import struct
+import sys
+
+from .program import OPS
+
+
+TraceRecord = namedtuple("TraceRecord", "pos ins opcode op rb args")
+
+
+class Tracer:
+    """
+    Attach as Program(..., tracer=t) to see every executed instruction.
+
+    Each instruction is turned into a TraceRecord and passed to record(),
+    which subclasses override, and to the callbacks registered for its
+    opcode with on().
+    """
+
+    def __init__(self):
+        self.callbacks = {}
+
+    def on(self, opcode, fn):
+        """Call fn(vm, record) before every instruction with this opcode"""
+        self.callbacks.setdefault(opcode, []).append(fn)
+        return fn
+
+    def __call__(self, vm, pos, h, a, b, c):
+        r = TraceRecord(pos, h.ins, h.opcode, h.op, vm.rb, (a, b, c)[:h.size - 1])
+        self.record(r)
+        for fn in self.callbacks.get(h.opcode, ()):
+            fn(vm, r)
+
+    def record(self, r):
+        pass
+
+
+class LogTracer(Tracer):
+    """Print every instruction, e.g. [12: add 1 2 3], to file"""
+
+    def __init__(self, file=sys.stderr):
+        super().__init__()
+        self.file = file
+
+    def record(self, r):
+        print("[{}: {}]".format(r.pos, " ".join([r.op] + [str(a) for a in r.args])), file=self.file)
+
+
+class ListTracer(Tracer):
+    """Keep every TraceRecord in self.records"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def record(self, r):
+        self.records.append(r)
+
+
+# pos, ins, rb, a, b, c
+_RECORD = struct.Struct("<6q")
+
+
+class BinaryTracer(Tracer):
+    """
+    Write fixed size records to a file, readable with read_trace().
+
+    Values must fit in 64 bits. Use as a context manager or call close().
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.f = open(path, "wb")
+
+    def record(self, r):
+        args = r.args + (0,) * (3 - len(r.args))
+        self.f.write(_RECORD.pack(r.pos, r.ins, r.rb, *args))
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_trace(path):
+    """Yield the TraceRecords of a file written by BinaryTracer"""
+    with open(path, "rb") as f:
+        data = f.read()
+    for pos, ins, rb, a, b, c in _RECORD.iter_unpack(data):
+        op, size, _ = OPS[ins % 100]
+        yield TraceRecord(pos, ins, ins % 100, op, rb, (a, b, c)[:size - 1])